@@ -0,0 +1,168 @@
+# core/activity.py
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from supabase_client import supabase
+from core import db
+
+cloud_logger = logging.getLogger("bookshelf")
+
+# Write-behind settings: flush every N seconds or once this many events pile up
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "2"))
+ACTIVITY_FLUSH_SIZE = int(os.getenv("ACTIVITY_FLUSH_SIZE", "200"))
+ACTIVITY_MAX_PENDING = int(os.getenv("ACTIVITY_MAX_PENDING", "10000"))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ActivityBuffer:
+    """Batches recently_viewed and search_history writes and flushes them in bulk.
+
+    Repeat events for the same (user, book) or (user, query) collapse into
+    one row carrying the latest timestamp.
+    """
+
+    def __init__(self):
+        self._views = OrderedDict()  # (user_email, book_id) -> row
+        self._searches = OrderedDict()  # (user_email, query) -> row
+        # Created in start() so they bind to the serving event loop
+        self._wakeup = None
+        self._flush_lock = None
+        self._task = None
+
+    # --- producers (called from request handlers, never block) ---
+
+    def record_view(self, user_email, book_id, title, thumbnail):
+        key = (user_email, book_id)
+        self._views.pop(key, None)
+        self._views[key] = {
+            "user_email": user_email,
+            "book_id": book_id,
+            "title": title,
+            "thumbnail": thumbnail,
+            "created_at": _now(),
+        }
+        self._after_add(self._views)
+
+    def record_search(self, user_email, query):
+        key = (user_email, query)
+        self._searches.pop(key, None)
+        self._searches[key] = {
+            "user_email": user_email,
+            "query": query,
+            "created_at": _now(),
+        }
+        self._after_add(self._searches)
+
+    def pending_views(self, user_email) -> list:
+        """Unflushed views for one user, newest first."""
+        return [
+            row
+            for (email, _), row in reversed(self._views.items())
+            if email == user_email
+        ]
+
+    def pending_searches(self, user_email) -> list:
+        """Unflushed search queries for one user, newest first."""
+        return [
+            row["query"]
+            for (email, _), row in reversed(self._searches.items())
+            if email == user_email
+        ]
+
+    def discard_user(self, user_email, views=True, searches=True):
+        """Drop unflushed events, e.g. when the user clears that list."""
+        for pending, wanted in ((self._views, views), (self._searches, searches)):
+            if wanted:
+                for key in [k for k in pending if k[0] == user_email]:
+                    del pending[key]
+
+    def _after_add(self, pending):
+        while len(pending) > ACTIVITY_MAX_PENDING:
+            pending.popitem(last=False)  # Supabase is down; shed the oldest
+        if (
+            self._wakeup
+            and len(self._views) + len(self._searches) >= ACTIVITY_FLUSH_SIZE
+        ):
+            self._wakeup.set()
+
+    # --- flushing ---
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            views, self._views = self._views, OrderedDict()
+            searches, self._searches = self._searches, OrderedDict()
+            if views:
+                try:
+                    await self._write_views(list(views.values()))
+                except Exception as e:
+                    cloud_logger.warning(f"⚠️ recently_viewed flush failed: {e}")
+                    self._requeue(self._views, views)
+            if searches:
+                try:
+                    await db.execute(
+                        supabase.table("search_history").upsert(
+                            list(searches.values()), on_conflict="user_email,query"
+                        )
+                    )
+                except Exception as e:
+                    cloud_logger.warning(f"⚠️ search_history flush failed: {e}")
+                    self._requeue(self._searches, searches)
+
+    async def _write_views(self, rows):
+        # Remove the older copies of each (user, book) pair, then one bulk insert
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row["user_email"], []).append(row["book_id"])
+        await asyncio.gather(
+            *(
+                db.execute(
+                    supabase.table("recently_viewed")
+                    .delete()
+                    .eq("user_email", email)
+                    .in_("book_id", book_ids)
+                )
+                for email, book_ids in by_user.items()
+            )
+        )
+        await db.execute(supabase.table("recently_viewed").insert(rows))
+
+    def _requeue(self, pending, failed):
+        # Newer events recorded during the flush win over the failed batch
+        for key, row in reversed(failed.items()):
+            if key not in pending:
+                pending[key] = row
+                pending.move_to_end(key, last=False)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), ACTIVITY_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Shielded so cancelling the loop on shutdown can't drop a batch mid-write
+            await asyncio.shield(self.flush())
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and drain whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        cloud_logger.info("📝 Activity buffer drained.")
+
+
+activity_buffer = ActivityBuffer()
@@ -0,0 +1,264 @@
+# core/backends.py
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+import urllib.parse
+from core.cache import TTLCache, register_cache
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # only needed for CACHE_BACKEND=redis
+    aioredis = None
+
+cloud_logger = logging.getLogger("bookshelf")
+
+# memory: per-process LRU · disk: SQLite file shared by the workers on one host
+# redis: any server speaking the Redis protocol (Redis, Valkey, a local stand-in)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_DISK_PATH = os.getenv("CACHE_DISK_PATH", "/tmp/bookshelf-cache.sqlite3")
+# A hit only rewrites the row's LRU clock once it is this stale, so cache
+# reads from several workers don't each take the WAL write lock
+CACHE_DISK_TOUCH_SECONDS = float(os.getenv("CACHE_DISK_TOUCH_SECONDS", "60"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+
+
+class CacheBackend:
+    """Async key → JSON value store with a TTL. Failures read as misses."""
+
+    name = "cache"
+
+    async def get(self, key: str):
+        raise NotImplementedError
+
+    async def set(self, key: str, value, ttl: float | None = None):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU with a byte cap and TTL (wraps core.cache.TTLCache)."""
+
+    def __init__(self, name: str, max_bytes: int, ttl_seconds: float):
+        self.name = name
+        self._cache = TTLCache(name, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+
+    async def get(self, key):
+        return self._cache.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, key):
+        self._cache.pop(key)
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class SQLiteBackend(CacheBackend):
+    """LRU in a SQLite file, so every worker on the host shares one copy.
+
+    Each named cache is its own table; rows past ``max_bytes`` are evicted
+    least-recently-read first (to within CACHE_DISK_TOUCH_SECONDS).
+    """
+
+    def __init__(self, name: str, max_bytes: int, ttl_seconds: float, path: str):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._table = "cache_" + "".join(c if c.isalnum() else "_" for c in name)
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        register_cache(name, self)
+
+    def _db(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self._table}_lru"
+                f" ON {self._table} (accessed_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            row = conn.execute(
+                f"SELECT value, accessed_at FROM {self._table}"
+                " WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[1] > CACHE_DISK_TOUCH_SECONDS:
+                conn.execute(
+                    f"UPDATE {self._table} SET accessed_at = ? WHERE key = ?",
+                    (now, key),
+                )
+                conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def _set(self, key, value, ttl):
+        encoded = json.dumps(value, default=str)
+        if len(encoded) > self.max_bytes:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl_seconds if ttl is None else ttl)
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self._table}"
+                " (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, len(encoded), expires_at, now),
+            )
+            conn.execute(f"DELETE FROM {self._table} WHERE expires_at <= ?", (now,))
+            (total,) = conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {self._table}"
+            ).fetchone()
+            if total > self.max_bytes:
+                self.evictions += self._evict(conn, total)
+            conn.commit()
+
+    def _evict(self, conn, total) -> int:
+        evicted = 0
+        rows = conn.execute(
+            f"SELECT key, size FROM {self._table} ORDER BY accessed_at"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        return evicted
+
+    def _delete(self, key):
+        with self._lock:
+            conn = self._db()
+            conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+            conn.commit()
+
+    async def get(self, key):
+        try:
+            return await asyncio.to_thread(self._get, key)
+        except sqlite3.Error as e:
+            cloud_logger.warning(f"⚠️ {self.name} disk cache read failed: {e}")
+            return None
+
+    async def set(self, key, value, ttl=None):
+        try:
+            await asyncio.to_thread(self._set, key, value, ttl)
+        except sqlite3.Error as e:
+            cloud_logger.warning(f"⚠️ {self.name} disk cache write failed: {e}")
+
+    async def delete(self, key):
+        try:
+            await asyncio.to_thread(self._delete, key)
+        except sqlite3.Error as e:
+            cloud_logger.warning(f"⚠️ {self.name} disk cache delete failed: {e}")
+
+    def stats(self):
+        return {
+            "backend": "disk",
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisBackend(CacheBackend):
+    """Cache on a Redis server via redis.asyncio (pooled, reconnects itself).
+
+    Memory is bounded server-side (``maxmemory`` + an LRU policy); keys are
+    namespaced by cache name.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, url: str = REDIS_URL):
+        if aioredis is None:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package")
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self._client = aioredis.Redis.from_url(
+            url, socket_timeout=2, socket_connect_timeout=2, health_check_interval=30
+        )
+        parts = urllib.parse.urlsplit(url)  # for stats; never show the password
+        self._server = f"{parts.hostname}:{parts.port or 6379}{parts.path or '/0'}"
+        self._prefix = f"bookshelf:{name}:"
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        register_cache(name, self)
+
+    async def get(self, key):
+        try:
+            raw = await self._client.get(self._prefix + key)
+        except Exception as e:
+            self.errors += 1
+            cloud_logger.warning(f"⚠️ {self.name} redis read failed: {e}")
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key, value, ttl=None):
+        seconds = max(1, int(self.ttl_seconds if ttl is None else ttl))
+        try:
+            await self._client.set(
+                self._prefix + key, json.dumps(value, default=str), ex=seconds
+            )
+        except Exception as e:
+            self.errors += 1
+            cloud_logger.warning(f"⚠️ {self.name} redis write failed: {e}")
+
+    async def delete(self, key):
+        try:
+            await self._client.delete(self._prefix + key)
+        except Exception as e:
+            self.errors += 1
+            cloud_logger.warning(f"⚠️ {self.name} redis delete failed: {e}")
+
+    def stats(self):
+        return {
+            "backend": "redis",
+            "server": self._server,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+def make_backend(name: str, max_bytes: int, ttl_seconds: float) -> CacheBackend:
+    """The CACHE_BACKEND-selected store for one named cache."""
+    if CACHE_BACKEND == "disk":
+        return SQLiteBackend(name, max_bytes, ttl_seconds, CACHE_DISK_PATH)
+    if CACHE_BACKEND == "redis":
+        return RedisBackend(name, ttl_seconds, REDIS_URL)
+    return MemoryBackend(name, max_bytes, ttl_seconds)
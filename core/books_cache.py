@@ -0,0 +1,91 @@
+# core/books_cache.py
+import os
+from datetime import datetime, timedelta
+from supabase_client import supabase
+from core import db
+from core.cache import TTLCache
+
+CACHE_EXPIRY_HOURS = 72  # adjust to taste (3 days)
+BOOK_CACHE_MAX_BYTES = int(os.getenv("BOOK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Hot volumes live in memory in front of the Supabase books_cache table.
+book_cache = TTLCache(
+    "books", max_bytes=BOOK_CACHE_MAX_BYTES, ttl_seconds=CACHE_EXPIRY_HOURS * 3600
+)
+
+
+async def get_cached_book(book_id: str):
+    """Return cached volume JSON (memory, then Supabase) or None if missing/expired."""
+    book_data = book_cache.get(book_id)
+    if book_data is not None:
+        return book_data
+
+    res = await db.execute(
+        supabase.table("books_cache").select("data, created_at").eq("id", book_id)
+    )
+    if not res.data:
+        return None
+
+    cached = res.data[0]
+    created_at = datetime.fromisoformat(cached["created_at"].ljust(26, "0"))
+    expires_at = created_at + timedelta(hours=CACHE_EXPIRY_HOURS)
+    if datetime.utcnow() >= expires_at:
+        return None
+
+    # Keep the row's original expiry so memory never outlives the table TTL
+    book_cache.set(
+        book_id,
+        cached["data"],
+        ttl=(expires_at - datetime.utcnow()).total_seconds(),
+    )
+    return cached["data"]
+
+
+def _cache_row(book_id: str, book_data: dict) -> dict:
+    info = book_data["volumeInfo"]
+    return {
+        "id": book_id,
+        "title": info.get("title"),
+        "authors": info.get("authors", []),
+        "thumbnail": info.get("imageLinks", {}).get("thumbnail"),
+        "data": book_data,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+
+async def save_book(book_id: str, book_data: dict):
+    """Store a volume in memory and upsert it into books_cache."""
+    book_cache.set(book_id, book_data)
+    try:
+        await db.execute(
+            supabase.table("books_cache").upsert(_cache_row(book_id, book_data))
+        )
+    except Exception as e:
+        print("Cache insert error:", e)
+
+
+async def save_books(volumes: list):
+    """Fill books_cache gaps from a page of search results.
+
+    List-endpoint volumes are thinner than single-volume ones, so rows that
+    already exist (e.g. from a detail view) are left alone, with their
+    original expiry. Nothing goes into memory: that tier is for books people
+    actually open, and get_cached_book loads these rows on first view.
+    """
+    rows = [
+        _cache_row(volume["id"], volume)
+        for volume in volumes
+        if volume.get("id")
+        and volume.get("volumeInfo")
+        and volume["id"] not in book_cache
+    ]
+    if not rows:
+        return
+    try:
+        await db.execute(
+            supabase.table("books_cache").upsert(
+                rows, ignore_duplicates=True, returning="minimal"
+            )
+        )
+    except Exception as e:
+        print("Cache insert error:", e)
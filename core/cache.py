@@ -0,0 +1,119 @@
+# core/cache.py
+import json
+from collections import OrderedDict
+from time import time
+
+# Every named cache registers itself here so /admin/cache-stats can report it.
+_registry = {}
+
+
+def _json_size(value) -> int:
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class TTLCache:
+    """In-process LRU cache with per-entry expiry and a byte budget.
+
+    Entry sizes are estimated from their JSON encoding (or a custom
+    ``sizeof``). Least-recently-used entries are evicted once either
+    ``max_bytes`` or ``max_items`` is exceeded.
+    """
+
+    def __init__(self, name, max_bytes, ttl_seconds, max_items=None, sizeof=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._sizeof = sizeof or _json_size
+        self._data = OrderedDict()  # key -> (value, expires_at, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        register_cache(name, self)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        value, expires_at, _ = entry
+        if expires_at <= time():
+            self._remove(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        if expires_at is None:
+            expires_at = time() + (self.ttl_seconds if ttl is None else ttl)
+        if expires_at <= time():
+            return
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return  # never cache a single entry bigger than the whole budget
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, expires_at, size)
+        self.bytes += size
+        self._evict()
+
+    def expires_at(self, key):
+        """When ``key`` expires (unix time), or None if it isn't cached."""
+        entry = self._data.get(key)
+        return entry[1] if entry else None
+
+    def pop(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        self._remove(key)
+        return entry[0]
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[1] > time()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self.bytes -= size
+
+    def _evict(self):
+        while self._data and (
+            self.bytes > self.max_bytes
+            or (self.max_items and len(self._data) > self.max_items)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def register_cache(name, cache):
+    """List a cache (anything with ``stats()``) in /admin/cache-stats."""
+    _registry[name] = cache
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _registry.items()}
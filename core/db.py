@@ -0,0 +1,49 @@
+# core/db.py
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+cloud_logger = logging.getLogger("bookshelf")
+
+# supabase-py's PostgREST client is synchronous, so every .execute() is run on
+# a bounded thread pool instead of blocking the event loop.
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "16"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "8"))
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=DB_MAX_WORKERS, thread_name_prefix="supabase"
+        )
+    return _executor
+
+
+async def run(fn, *args, timeout: float | None = None):
+    """Run a blocking callable on the DB pool and await its result.
+
+    On timeout the awaiting request gives up with asyncio.TimeoutError; the
+    worker thread finishes the call in the background.
+    """
+    loop = asyncio.get_running_loop()
+    fut = loop.run_in_executor(_get_executor(), lambda: fn(*args))
+    return await asyncio.wait_for(fut, timeout or DB_TIMEOUT)
+
+
+async def execute(query, timeout: float | None = None):
+    """Await a supabase query builder, e.g.
+    ``await db.execute(supabase.table("favorites").select("*").eq(...))``."""
+    return await run(query.execute, timeout=timeout)
+
+
+def shutdown():
+    """Release the DB pool (called from main.py lifespan)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        cloud_logger.info("🗄️ Supabase executor shut down.")
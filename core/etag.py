@@ -0,0 +1,104 @@
+# core/etag.py
+import hashlib
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from core.compression import ETAG_SUFFIXES
+
+# Rendered pages are per-user: let the browser keep a copy but always revalidate
+PAGE_CACHE_CONTROL = "private, no-cache"
+
+
+def strong_etag(*parts) -> str:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ETAG_SUFFIXES.values():
+        if tag.endswith(suffix + '"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+
+def matched_etag(if_none_match: str | None, etag: str) -> str | None:
+    """The If-None-Match tag that matches ``etag`` (ignoring the per-encoding
+    suffix), or None. A 304 echoes it, so it names the representation the
+    client holds, e.g. ``"x-gzip"`` rather than ``"x"``."""
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    for tag in if_none_match.split(","):
+        if _opaque(tag) == _opaque(etag):
+            return tag.strip()
+    return None
+
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Response | None:
+    """A 304 if the client already holds ``etag``, else None."""
+    matched = matched_etag(request.headers.get("if-none-match"), etag)
+    if matched:
+        return Response(
+            status_code=304, headers={"ETag": matched, "Cache-Control": cache_control}
+        )
+    return None
+
+
+class PageCacheMiddleware:
+    """Cache headers for rendered HTML: private revalidation with a body-hash
+    ETag, answering 304 when the page comes out byte-identical."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start = None
+        chunks = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] != 200 or not headers.get(
+                    "content-type", ""
+                ).startswith("text/html"):
+                    passthrough = True
+                    return await send(message)
+                start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                return await send(message)
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            headers = MutableHeaders(raw=start["headers"])
+            headers.setdefault("Cache-Control", PAGE_CACHE_CONTROL)
+            headers.add_vary_header("Cookie")
+            if body and "etag" not in headers:
+                headers["ETag"] = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+            matched = matched_etag(if_none_match, headers.get("etag", ""))
+            if matched:
+                headers["ETag"] = matched
+                for name in ("content-length", "content-type"):
+                    if name in headers:
+                        del headers[name]
+                await send({**start, "status": 304})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,28 @@
+# core/fanout.py
+import asyncio
+
+
+async def bounded_stream(factories, limit: int, timeout: float | None = None):
+    """Run coroutine factories with at most ``limit`` in flight.
+
+    Yields ``(index, result)`` in completion order; a call that raises or
+    exceeds ``timeout`` yields its exception instead. Whatever is still
+    pending is cancelled once the consumer stops iterating, so callers can
+    ``break`` as soon as they have enough (wrap in ``contextlib.aclosing``).
+    """
+    sem = asyncio.Semaphore(limit)
+
+    async def _run(index, factory):
+        async with sem:
+            try:
+                return index, await asyncio.wait_for(factory(), timeout)
+            except Exception as e:
+                return index, e
+
+    tasks = [asyncio.ensure_future(_run(i, f)) for i, f in enumerate(factories)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for t in tasks:
+            t.cancel()
@@ -0,0 +1,99 @@
+# core/genres.py
+import logging
+from supabase_client import supabase
+from core import db
+
+cloud_logger = logging.getLogger("bookshelf")
+
+GENRE_LIMIT = 15
+
+DEFAULT_GENRES = [
+    "Romance",
+    "Mystery",
+    "Fantasy",
+    "Action",
+    "Science Fiction",
+    "Horror",
+    "Adventure",
+    "Western",
+]
+
+
+def parse_genres(categories: str | None) -> list:
+    """Genre names from a favorite's comma-separated categories string.
+
+    "Fiction / Thrillers, Science" → ["Fiction", "Science"]. Repeats are kept:
+    each occurrence counts once in the histogram.
+    """
+    genres = []
+    for raw_cat in (categories or "").split(","):
+        c = raw_cat.strip()
+        if "/" in c:
+            c = c.split("/", 1)[0].strip()
+        # skip empty or too short
+        if len(c) < 4:
+            continue
+        # normalize capitalization
+        genres.append(c.title())
+    return genres
+
+
+def rank_genres(counts) -> list:
+    """Default genres plus ``(name, count)`` pairs, most-liked first, top 15."""
+    genres = [{"name": g, "link": g, "count": 0} for g in DEFAULT_GENRES]
+    genre_map = {g["name"].lower(): g for g in genres}
+    for name, count in counts:
+        key = name.lower()
+        if key in genre_map:
+            genre_map[key]["count"] += count
+        else:
+            genres.append({"name": name, "link": name, "count": count})
+            genre_map[key] = genres[-1]
+
+    # --- Sort user-added genres above defaults ---
+    genres = sorted(
+        genres,
+        key=lambda x: (x["count"], x["name"] not in DEFAULT_GENRES),
+        reverse=True,
+    )
+    return genres[:GENRE_LIMIT]
+
+
+async def bump_genres(user_email: str, categories: str | None, delta: int):
+    """Add (or with delta=-1, remove) one favorite's genres to the index."""
+    genres = parse_genres(categories)
+    if not genres:
+        return
+    try:
+        await db.execute(
+            supabase.rpc(
+                "bump_user_genres",
+                {"p_user_email": user_email, "p_genres": genres, "p_delta": delta},
+            )
+        )
+    except Exception as e:
+        cloud_logger.warning(f"⚠️ Genre index update failed for {user_email}: {e}")
+
+
+async def load_genres(user_email: str) -> list:
+    """Ranked homepage genres from the top counts in user_genres."""
+    try:
+        res = await db.execute(
+            supabase.table("user_genres")
+            .select("genre, count")
+            .eq("user_email", user_email)
+            .order("count", desc=True)
+            .limit(GENRE_LIMIT)
+        )
+        return rank_genres((r["genre"], r["count"]) for r in res.data or [])
+    except Exception as e:
+        # Index not migrated yet (sql/user_genres.sql): derive it the old way
+        cloud_logger.warning(f"⚠️ user_genres unavailable, scanning favorites: {e}")
+        res = await db.execute(
+            supabase.table("favorites")
+            .select("categories")
+            .eq("user_email", user_email)
+        )
+        return rank_genres(
+            (g, 1) for fav in res.data or [] for g in parse_genres(fav["categories"])
+        )
@@ -0,0 +1,77 @@
+# core/history.py
+import os
+import logging
+from collections import deque
+from supabase_client import supabase
+from core import db
+from core.cache import TTLCache
+from core.activity import activity_buffer
+
+cloud_logger = logging.getLogger("bookshelf")
+
+HISTORY_SIZE = 10
+# Per-process buffers: re-read this often so searches and clears made on
+# another worker show up here too
+HISTORY_CACHE_SECONDS = int(os.getenv("HISTORY_CACHE_SECONDS", "60"))
+
+# Per-user ring buffer of the latest searches, newest first
+_buffers = TTLCache(
+    "search_history",
+    max_bytes=4 * 1024 * 1024,
+    ttl_seconds=HISTORY_CACHE_SECONDS,
+    sizeof=lambda buf: 64 + sum(len(q) + 48 for q in buf),
+)
+
+
+def history_labels(search_history_raw):
+    """Pair raw queries with display labels for the history chips."""
+    search_history_display = []
+    for item in search_history_raw:
+        if item.startswith("inauthor:"):
+            label = "Author: " + item.replace("inauthor:", "")
+        elif item.startswith("intitle:"):
+            label = "Title: " + item.replace("intitle:", "")
+        elif item.startswith("subject:"):
+            label = "Category: " + item.replace("subject:", "")
+        else:
+            label = item
+        search_history_display.append(label)
+    return list(zip(search_history_raw, search_history_display))
+
+
+async def get_history(user_email: str) -> list:
+    """Latest searches from the ring buffer, re-seeded from Supabase (plus
+    this worker's unflushed searches) once it expires."""
+    buf = _buffers.get(user_email)
+    if buf is None:
+        res = await db.execute(
+            supabase.table("search_history")
+            .select("query")
+            .eq("user_email", user_email)
+            .order("created_at", desc=True)
+            .limit(HISTORY_SIZE)
+        )
+        queries = activity_buffer.pending_searches(user_email) + [
+            h["query"] for h in res.data or []
+        ]
+        buf = deque(list(dict.fromkeys(queries))[:HISTORY_SIZE], maxlen=HISTORY_SIZE)
+        _buffers.set(user_email, buf)
+    return list(buf)
+
+
+def remember_search(user_email: str, query: str) -> list:
+    """Move ``query`` to the front of the user's buffer and return it."""
+    buf = _buffers.get(user_email)
+    if buf is None:
+        return [query]  # not loaded; the next get_history() seeds from Supabase
+    if query in buf:
+        buf.remove(query)
+    buf.appendleft(query)
+    # Re-set so the cache re-measures the grown buffer against its byte cap;
+    # same expiry, so a busy searcher still re-reads other workers' changes
+    _buffers.set(user_email, buf, expires_at=_buffers.expires_at(user_email))
+    return list(buf)
+
+
+def forget_history(user_email: str):
+    _buffers.pop(user_email)
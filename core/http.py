@@ -0,0 +1,62 @@
+# core/http.py
+import os
+import logging
+import httpx
+
+cloud_logger = logging.getLogger("bookshelf")
+
+# Pool settings (override via env in production)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+
+_client: httpx.AsyncClient | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401  (httpx needs it for HTTP/2)
+        except ImportError:
+            cloud_logger.warning("⚠️ h2 not installed, falling back to HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    )
+
+
+async def start_http_client():
+    """Open the app-wide connection pool (called from main.py lifespan)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+        cloud_logger.info("🌐 Shared HTTP client started.")
+
+
+async def close_http_client():
+    """Close the pool and drop all keep-alive connections."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        cloud_logger.info("🌐 Shared HTTP client closed.")
+    _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily if the lifespan hasn't run
+    (e.g. scripts or tests importing a router directly)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
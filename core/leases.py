@@ -0,0 +1,30 @@
+# core/leases.py
+import os
+import socket
+import logging
+from supabase_client import supabase
+from core import db
+
+cloud_logger = logging.getLogger("bookshelf")
+
+# Identifies this worker process as a lease holder
+LEASE_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def claim_lease(name: str, seconds: int) -> bool:
+    """Try to become the only worker running job ``name`` for ``seconds``.
+
+    Backed by the claim_lease RPC (sql/job_leases.sql). If that isn't
+    available the job runs anyway, as it did before leases existed.
+    """
+    try:
+        res = await db.execute(
+            supabase.rpc(
+                "claim_lease",
+                {"p_name": name, "p_owner": LEASE_OWNER, "p_seconds": seconds},
+            )
+        )
+        return bool(res.data)
+    except Exception as e:
+        cloud_logger.warning(f"⚠️ Lease {name} unavailable, running anyway: {e}")
+        return True
@@ -0,0 +1,51 @@
+# core/membership.py
+import asyncio
+from supabase_client import supabase
+from core import db
+
+# One in_() filter per query; keeps the PostgREST URL well under proxy limits
+MEMBERSHIP_MAX_IDS = 100
+
+
+async def _favorite_ids(user_email: str, book_ids: list) -> set:
+    res = await db.execute(
+        supabase.table("favorites")
+        .select("book_id")
+        .eq("user_email", user_email)
+        .in_("book_id", book_ids)
+    )
+    return {r["book_id"] for r in res.data or []}
+
+
+async def load_shelf_rows(user_email: str, book_ids: list) -> list:
+    """``shelf_books`` rows for these books on the user's own shelves.
+
+    The inner join on shelves scopes the scan to this user (indexes in
+    sql/shelf_membership.sql).
+    """
+    res = await db.execute(
+        supabase.table("shelf_books")
+        .select("shelf_id, book_id, shelves!inner(user_email)")
+        .eq("shelves.user_email", user_email)
+        .in_("book_id", book_ids)
+    )
+    return res.data or []
+
+
+async def load_membership(user_email: str, book_ids) -> dict:
+    """Favorite and shelf state for many books in two queries.
+
+    Returns ``{book_id: {"favorite": bool, "shelves": [shelf_id, ...]}}`` for
+    every requested id (at most MEMBERSHIP_MAX_IDS, duplicates dropped).
+    """
+    ids = list(dict.fromkeys(b for b in book_ids if b))[:MEMBERSHIP_MAX_IDS]
+    if not ids:
+        return {}
+
+    favorites, shelf_rows = await asyncio.gather(
+        _favorite_ids(user_email, ids), load_shelf_rows(user_email, ids)
+    )
+    membership = {b: {"favorite": b in favorites, "shelves": []} for b in ids}
+    for row in shelf_rows:
+        membership[row["book_id"]]["shelves"].append(row["shelf_id"])
+    return membership
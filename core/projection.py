@@ -0,0 +1,44 @@
+# core/projection.py
+
+# The only volumeInfo fields the carousels, featured rows and /api/books use.
+# Records keep Google's {"id", "volumeInfo": {...}} shape so templates and
+# the carousel JS read them exactly like a full volume.
+BOOK_FIELDS = (
+    "title",
+    "authors",
+    "categories",
+    "averageRating",
+    "ratingsCount",
+    "publishedDate",
+)
+
+
+def slim_volume(volume: dict, description_chars: int = 0) -> dict:
+    """Project a Google Books volume down to the compact book record.
+
+    The full payload (saleInfo, accessInfo, description…) stays in
+    books_cache for the detail page. Safe to apply to an already slim record.
+    """
+    info = volume.get("volumeInfo") or {}
+    slim = {k: info[k] for k in BOOK_FIELDS if info.get(k) is not None}
+
+    thumbnail = (info.get("imageLinks") or {}).get("thumbnail")
+    if thumbnail:
+        slim["imageLinks"] = {"thumbnail": thumbnail}
+
+    isbns = [
+        {"type": i["type"], "identifier": i["identifier"]}
+        for i in info.get("industryIdentifiers") or []
+        if i.get("type") in ("ISBN_10", "ISBN_13") and i.get("identifier")
+    ]
+    if isbns:
+        slim["industryIdentifiers"] = isbns
+
+    if description_chars and info.get("description"):
+        slim["description"] = info["description"][:description_chars]
+
+    return {"id": volume.get("id"), "volumeInfo": slim}
+
+
+def slim_volumes(volumes, description_chars: int = 0) -> list:
+    return [slim_volume(v, description_chars) for v in volumes or [] if v]
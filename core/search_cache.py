@@ -0,0 +1,79 @@
+# core/search_cache.py
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from supabase_client import supabase
+from core import db
+from core.cache import TTLCache
+
+cloud_logger = logging.getLogger("bookshelf")
+
+SEARCH_FILTERS = ("intitle", "inauthor", "subject", "inpublisher", "isbn")
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(6 * 60 * 60)))  # seconds
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Share results across instances through Supabase (see sql/search_cache.sql)
+SEARCH_CACHE_TABLE = os.getenv("SEARCH_CACHE_TABLE", "false").lower() == "true"
+
+search_cache = TTLCache(
+    "search", max_bytes=SEARCH_CACHE_MAX_BYTES, ttl_seconds=SEARCH_CACHE_TTL
+)
+
+
+def normalize_query(q: str | None, filter: str | None = "") -> str:
+    """Canonical form of a search, e.g. ("  Jane  AUSTEN", "inauthor") and
+    "inauthor: jane austen" both become "inauthor:jane austen"."""
+    q = " ".join((q or "").split()).lower()
+    filter = (filter or "").strip().lower()
+    if not filter:
+        # History chips link the prefixed form back as a bare q
+        prefix, sep, rest = q.partition(":")
+        if sep and prefix.strip() in SEARCH_FILTERS:
+            filter, q = prefix.strip(), rest.strip()
+    if not q:
+        return ""
+    return f"{filter}:{q}" if filter else q
+
+
+async def get_cached_search(key: str):
+    """Cached result list for a normalized query (memory, then Supabase) or None."""
+    items = search_cache.get(key)
+    if items is not None or not SEARCH_CACHE_TABLE:
+        return items
+
+    try:
+        res = await db.execute(
+            supabase.table("search_cache").select("items, updated_at").eq("query", key)
+        )
+    except Exception as e:
+        cloud_logger.warning(f"⚠️ search_cache read failed: {e}")
+        return None
+    if not res.data:
+        return None
+
+    row = res.data[0]
+    expires_at = datetime.fromisoformat(row["updated_at"]) + timedelta(
+        seconds=SEARCH_CACHE_TTL
+    )
+    remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+    if remaining <= 0:
+        return None
+    search_cache.set(key, row["items"], ttl=remaining)
+    return row["items"]
+
+
+async def save_search(key: str, items: list):
+    search_cache.set(key, items)
+    if not SEARCH_CACHE_TABLE:
+        return
+    try:
+        await db.execute(
+            supabase.table("search_cache").upsert(
+                {
+                    "query": key,
+                    "items": items,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }
+            )
+        )
+    except Exception as e:
+        cloud_logger.warning(f"⚠️ search_cache write failed: {e}")
@@ -1,13 +1,105 @@
 # core/security.py
+import os
+import asyncio
+import hashlib
+import logging
+from time import time
+
+import jwt
 from fastapi import Request
 from supabase_client import supabase
+from core import db
+from core.cache import TTLCache
+
+cloud_logger = logging.getLogger("bookshelf")
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+# Legacy projects sign access tokens with this HS256 secret; newer ones
+# publish asymmetric signing keys at the JWKS endpoint instead.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+JWT_AUDIENCE = "authenticated"
+# Algorithms a JWKS key may verify; anything else in a token header is refused
+JWKS_ALGORITHMS = ("RS256", "ES256")
+TOKEN_CACHE_SECONDS = int(os.getenv("TOKEN_CACHE_SECONDS", "60"))
+
+_jwks_client = (
+    jwt.PyJWKClient(
+        f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json",
+        cache_keys=True,
+        lifespan=3600,
+        timeout=5,
+    )
+    if SUPABASE_URL
+    else None
+)
+
+# Recently verified tokens → email, so repeat calls skip even the signature check
+verified_tokens = TTLCache(
+    "auth_tokens", max_bytes=1024 * 1024, ttl_seconds=TOKEN_CACHE_SECONDS
+)
+
+
+async def _signing_key(token: str):
+    """Verification key and the one algorithm it may be used with.
 
-def get_current_user_email(request: Request) -> str | None:
+    The token header only picks which key to look up; the algorithm is pinned
+    to that key, so a header can't pair e.g. HS512 with an RSA public key.
+    """
+    alg = jwt.get_unverified_header(token).get("alg")
+    if alg == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise LookupError("SUPABASE_JWT_SECRET not configured")
+        return SUPABASE_JWT_SECRET, ["HS256"]
+    if alg not in JWKS_ALGORITHMS:
+        raise jwt.InvalidAlgorithmError(f"unsupported alg {alg!r}")
+    if not _jwks_client:
+        raise LookupError("no JWKS endpoint configured")
+    # PyJWKClient caches the key set; a refresh is a blocking HTTP call
+    signing_key = await asyncio.to_thread(_jwks_client.get_signing_key_from_jwt, token)
+    if signing_key.algorithm_name != alg:
+        raise jwt.InvalidAlgorithmError(
+            f"token alg {alg!r} does not match key ({signing_key.algorithm_name})"
+        )
+    return signing_key.key, [signing_key.algorithm_name]
+
+
+async def get_current_user_email(request: Request) -> str | None:
     token = request.cookies.get("access_token")
     if not token:
         return None
+
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    email = verified_tokens.get(cache_key)
+    if email:
+        return email
+
     try:
-        user = supabase.auth.get_user(token)
-        return user.user.email
-    except Exception:
+        key, algorithms = await _signing_key(token)
+    except (LookupError, jwt.PyJWKClientError) as e:
+        # Can't verify locally — fall back to asking Supabase
+        cloud_logger.warning(f"⚠️ Local JWT verification unavailable: {e}")
+        try:
+            user = await db.run(supabase.auth.get_user, token)
+            return user.user.email
+        except Exception:
+            return None
+    except jwt.PyJWTError:
         return None
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=algorithms,
+            audience=JWT_AUDIENCE,
+            options={"require": ["exp"]},
+        )
+    except (jwt.PyJWTError, TypeError, ValueError):
+        return None  # bad signature, expired, wrong audience, unusable key…
+
+    email = claims.get("email")
+    if email:
+        # Never cache past the token's own expiry
+        ttl = min(TOKEN_CACHE_SECONDS, claims["exp"] - time())
+        verified_tokens.set(cache_key, email, ttl=ttl)
+    return email
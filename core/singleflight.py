@@ -0,0 +1,53 @@
+# core/singleflight.py
+import asyncio
+import logging
+
+cloud_logger = logging.getLogger("bookshelf")
+
+# Strong references to fire-and-forget tasks so they aren't garbage collected
+_background = set()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight task.
+
+    The first caller starts ``fn(*args)``; everyone else arriving before it
+    finishes awaits the same task. Callers are shielded from each other, so
+    one request timing out doesn't cancel the shared fetch.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self, key) -> bool:
+        return key in self._inflight
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+
+def spawn(coro):
+    """Run a coroutine in the background, logging (not raising) failures."""
+    task = asyncio.ensure_future(coro)
+    _background.add(task)
+
+    def _done(t):
+        _background.discard(t)
+        if not t.cancelled() and t.exception():
+            cloud_logger.error(f"❌ Background task failed: {t.exception()!r}")
+
+    task.add_done_callback(_done)
+    return task
@@ -0,0 +1,46 @@
+# core/snapshots.py
+import os
+from time import time
+from core.cache import TTLCache
+
+# Upper bound only; mutation endpoints invalidate the snapshot as they happen.
+# The TTL covers writes made by another instance or straight in Supabase.
+HOMEPAGE_SNAPSHOT_TTL = int(os.getenv("HOMEPAGE_SNAPSHOT_TTL", "900"))
+VIEWED_LIMIT = 5
+
+# user_email -> {"favorites", "shelves", "viewed", "genres"} for the homepage
+homepage_snapshots = TTLCache(
+    "homepage",
+    max_bytes=int(os.getenv("HOMEPAGE_SNAPSHOT_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl_seconds=HOMEPAGE_SNAPSHOT_TTL,
+)
+
+
+def get_snapshot(user_email: str):
+    return homepage_snapshots.get(user_email)
+
+
+def save_snapshot(user_email: str, snapshot: dict):
+    snapshot["expires_at"] = time() + HOMEPAGE_SNAPSHOT_TTL
+    homepage_snapshots.set(user_email, snapshot, expires_at=snapshot["expires_at"])
+
+
+def invalidate_homepage(user_email: str):
+    """Drop the user's snapshot after a favorite/shelf/history change."""
+    homepage_snapshots.pop(user_email)
+
+
+def note_view(user_email: str, book_id: str, title: str, thumbnail: str):
+    """Move a just-opened book to the front of the snapshot's recently viewed
+    list, so a view doesn't cost the user their cached homepage."""
+    snapshot = homepage_snapshots.get(user_email)
+    if snapshot is None:
+        return
+    row = {"book_id": book_id, "title": title, "thumbnail": thumbnail}
+    viewed = [row] + [v for v in snapshot["viewed"] if v["book_id"] != book_id]
+    # Same expiry as before: a view must not extend the snapshot's lifetime
+    homepage_snapshots.set(
+        user_email,
+        {**snapshot, "viewed": viewed[:VIEWED_LIMIT]},
+        expires_at=snapshot["expires_at"],
+    )
@@ -0,0 +1,123 @@
+# core/static.py
+import os
+import gzip
+import hashlib
+import logging
+from urllib.parse import parse_qs
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+from core.compression import accepted_encodings, brotli
+
+cloud_logger = logging.getLogger("bookshelf")
+
+STATIC_DIR = "static"
+STATIC_PREFIX = "/static"
+# ?v=<hash> URLs never change content, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unversioned URLs (e.g. url() references inside CSS) revalidate via ETag
+STATIC_CACHE_CONTROL = os.getenv("STATIC_CACHE_CONTROL", "public, max-age=3600")
+PRECOMPRESS_SUFFIXES = (".css", ".js", ".svg", ".json", ".txt")
+VARIANTS = (("br", ".br"), ("gzip", ".gz"))  # preference order
+
+_manifest = {}  # "styles.css" -> content hash
+
+
+def _file_hash(full_path: str) -> str:
+    h = hashlib.sha256()
+    with open(full_path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _precompress(full_path: str):
+    """Write .gz (and .br when brotli is installed) next to a text asset."""
+    with open(full_path, "rb") as f:
+        data = f.read()
+    mtime = os.stat(full_path).st_mtime
+    encoders = [(".gz", lambda b: gzip.compress(b, compresslevel=9, mtime=0))]
+    if brotli:
+        encoders.append((".br", lambda b: brotli.compress(b, quality=11)))
+    for ext, encode in encoders:
+        target = full_path + ext
+        if os.path.exists(target) and os.stat(target).st_mtime >= mtime:
+            continue
+        tmp = f"{target}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(encode(data))
+        os.replace(tmp, target)
+
+
+def build_manifest(directory: str = STATIC_DIR):
+    """Hash every asset (and precompress text ones) once at startup."""
+    _manifest.clear()
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith((".gz", ".br", ".tmp")):
+                continue
+            full_path = os.path.join(root, name)
+            rel = os.path.relpath(full_path, directory).replace(os.sep, "/")
+            _manifest[rel] = _file_hash(full_path)
+            if name.endswith(PRECOMPRESS_SUFFIXES):
+                try:
+                    _precompress(full_path)
+                except OSError as e:  # read-only image: compress on the fly instead
+                    cloud_logger.warning(f"⚠️ Could not precompress {rel}: {e}")
+    cloud_logger.info(f"🗂️ Fingerprinted {len(_manifest)} static assets.")
+
+
+def static_url(path: str) -> str:
+    """Fingerprinted URL for a file under static/, for use in templates."""
+    rel = path.lstrip("/")
+    version = _manifest.get(rel)
+    return f"{STATIC_PREFIX}/{rel}?v={version}" if version else f"{STATIC_PREFIX}/{rel}"
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching for fingerprinted URLs and
+    precompressed .br/.gz variants when the client accepts them."""
+
+    def __init__(self, *, directory: str = STATIC_DIR, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        build_manifest(directory)
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code not in (200, 304):
+            return response
+
+        rel = path.replace(os.sep, "/")
+        if isinstance(response, FileResponse) and response.status_code == 200:
+            response = self._variant(response, scope) or response
+            if rel.endswith(PRECOMPRESS_SUFFIXES):
+                response.headers["Vary"] = "Accept-Encoding"
+
+        version = parse_qs(scope.get("query_string", b"").decode()).get("v", [None])[0]
+        fingerprinted = version is not None and _manifest.get(rel) == version
+        response.headers["Cache-Control"] = (
+            IMMUTABLE_CACHE_CONTROL if fingerprinted else STATIC_CACHE_CONTROL
+        )
+        return response
+
+    def _variant(self, response: FileResponse, scope):
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding, ext in VARIANTS:
+            if encoding not in accepted:
+                continue
+            variant_path = response.path + ext
+            try:
+                stat_result = os.stat(variant_path)
+            except OSError:
+                continue
+            variant = FileResponse(
+                variant_path,
+                stat_result=stat_result,
+                media_type=response.media_type,
+                headers={"Content-Encoding": encoding},
+            )
+            if self.is_not_modified(variant.headers, Headers(scope=scope)):
+                return NotModifiedResponse(variant.headers)
+            return variant
+        return None
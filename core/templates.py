@@ -0,0 +1,75 @@
+# core/templates.py
+import os
+import logging
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from core.cache import TTLCache
+from core.static import static_url
+from core.thumbs import THUMB_ALLOWED_HOSTS, thumb_url
+
+cloud_logger = logging.getLogger("bookshelf")
+
+TEMPLATE_DIR = "templates"
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", "/tmp/bookshelf-jinja")
+# Templates only change on deploy; set to true while editing them locally
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "false").lower() == "true"
+
+# Rendered fragments, keyed by the data version they were rendered from
+fragment_cache = TTLCache("fragments", max_bytes=8 * 1024 * 1024, ttl_seconds=3600)
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache "name", version, ... %}…{% endcache %}`` — render the body
+    once per distinct key and reuse the HTML until the key changes."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render", [nodes.List(parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        key = "|".join(str(p) for p in parts)
+        html = fragment_cache.get(key)
+        if html is None:
+            html = str(caller())
+            fragment_cache.set(key, html)
+        return Markup(html)
+
+
+def _environment() -> Environment:
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        auto_reload=TEMPLATE_AUTO_RELOAD,
+        cache_size=-1,  # never evict a compiled template
+        bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+        extensions=[FragmentCacheExtension],
+    )
+    env.globals["static_url"] = static_url
+    env.filters["thumb"] = thumb_url
+    # For client-side card rendering that mirrors the thumb filter
+    env.globals["thumb_hosts"] = sorted(THUMB_ALLOWED_HOSTS)
+    return env
+
+
+# One environment for every router, so each template is compiled once
+templates = Jinja2Templates(env=_environment())
+
+
+def precompile_templates():
+    """Compile every template up front instead of on its first request."""
+    env = templates.env
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    cloud_logger.info(f"🧩 Precompiled {len(names)} templates.")
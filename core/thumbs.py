@@ -0,0 +1,205 @@
+# core/thumbs.py
+import io
+import os
+import asyncio
+import hashlib
+import logging
+import threading
+import urllib.parse
+from core.http import get_http_client
+
+try:
+    from PIL import Image
+except ImportError:  # optional; without it covers are cached and served as-is
+    Image = None
+
+cloud_logger = logging.getLogger("bookshelf")
+
+THUMB_CACHE_DIR = os.getenv("THUMB_CACHE_DIR", "/tmp/bookshelf-thumbs")
+THUMB_CACHE_MAX_BYTES = int(os.getenv("THUMB_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Only cover hosts we actually link to; add a local fake origin here in tests
+THUMB_ALLOWED_HOSTS = {
+    h.strip().lower()
+    for h in os.getenv(
+        "THUMB_ALLOWED_HOSTS",
+        "books.google.com,books.googleusercontent.com,covers.openlibrary.org",
+    ).split(",")
+    if h.strip()
+}
+THUMB_MAX_SOURCE_BYTES = 5 * 1024 * 1024
+THUMB_MAX_REDIRECTS = 3
+
+# Max rendered height per template slot, doubled for high-DPI screens
+THUMB_SIZES = {
+    "xs": 120,  # .thumb-img rows on the homepage
+    "sm": 300,  # featured cards (150px)
+    "md": 400,  # carousel (200px)
+    "lg": 600,  # detail, favorites and shelf pages
+}
+DEFAULT_SIZE = "md"
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+
+def is_allowed(url: str) -> bool:
+    parts = urllib.parse.urlsplit(url)
+    return parts.scheme in ("http", "https") and parts.netloc.lower() in (
+        THUMB_ALLOWED_HOSTS
+    )
+
+
+def thumb_url(url: str | None, size: str = DEFAULT_SIZE) -> str:
+    """Jinja filter: route a cover URL through the /thumb proxy."""
+    if not url or not is_allowed(url):
+        return url or ""
+    return f"/thumb?size={size}&url={urllib.parse.quote(url, safe='')}"
+
+
+class DiskLRU:
+    """Byte-bounded file cache; mtime doubles as the LRU clock."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._sizes = None  # path -> bytes, loaded on first use
+        self._total = 0
+        self._lock = threading.Lock()  # called from worker threads
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def _load(self):
+        if self._sizes is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._sizes = {}
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    self._sizes[entry.path] = entry.stat().st_size
+            self._total = sum(self._sizes.values())
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        with self._lock:
+            self._load()
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used
+            return data
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._load()
+            self._total += len(data) - self._sizes.get(path, 0)
+            self._sizes[path] = len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        by_age = []
+        for path in list(self._sizes):
+            try:
+                by_age.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                self._total -= self._sizes.pop(path)
+        by_age.sort()
+        # Trim to 90% so we don't evict on every write once full
+        for _, path in by_age:
+            if self._total <= self.max_bytes * 0.9:
+                break
+            self._total -= self._sizes.pop(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+thumb_store = DiskLRU(THUMB_CACHE_DIR, THUMB_CACHE_MAX_BYTES)
+
+
+def pick_format(accept: str) -> str:
+    if Image is None:
+        return "orig"
+    return "webp" if "image/webp" in (accept or "") else "jpeg"
+
+
+def _media_type(data: bytes) -> str:
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/jpeg"
+
+
+def _render(source: bytes, height: int, fmt: str) -> bytes:
+    with Image.open(io.BytesIO(source)) as img:
+        img = img.convert("RGB")
+        # Only ever shrink; Google thumbnails are often smaller than the slot
+        img.thumbnail((height * 2, height))
+        out = io.BytesIO()
+        if fmt == "webp":
+            img.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            img.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+async def _fetch_source(url: str) -> bytes:
+    key = f"{url}|source"
+    source = await asyncio.to_thread(thumb_store.get, key)
+    if source is not None:
+        return source
+
+    source = await _download(url)
+    await asyncio.to_thread(thumb_store.set, key, source)
+    return source
+
+
+async def _download(url: str) -> bytes:
+    """Fetch an allowlisted image, following redirects one hop at a time so
+    every host is checked before it is contacted, and streaming the body so
+    an oversized one is dropped at the limit rather than buffered whole."""
+    client = get_http_client()
+    for _ in range(THUMB_MAX_REDIRECTS + 1):
+        async with client.stream("GET", url, timeout=10) as resp:
+            if resp.is_redirect:
+                url = str(resp.url.join(resp.headers["location"]))
+                if not is_allowed(url):
+                    raise ValueError(f"redirect off the allowlist: {url}")
+                continue
+            resp.raise_for_status()
+            content_type = resp.headers.get("content-type", "")
+            if not content_type.startswith("image/"):
+                raise ValueError(f"not an image: {content_type}")
+            if int(resp.headers.get("content-length") or 0) > THUMB_MAX_SOURCE_BYTES:
+                raise ValueError("image too large")
+            body = bytearray()
+            async for chunk in resp.aiter_bytes():
+                body += chunk
+                if len(body) > THUMB_MAX_SOURCE_BYTES:
+                    raise ValueError("image too large")
+            return bytes(body)
+    raise ValueError(f"too many redirects for {url}")
+
+
+async def get_thumbnail(url: str, size: str, fmt: str) -> tuple[bytes, str]:
+    """Resized cover bytes and media type, from disk or fetched once upstream."""
+    key = f"{url}|{size}|{fmt}"
+    data = await asyncio.to_thread(thumb_store.get, key)
+    if data is None:
+        source = await _fetch_source(url)
+        if fmt == "orig":
+            data = source
+        else:
+            data = await asyncio.to_thread(_render, source, THUMB_SIZES[size], fmt)
+            await asyncio.to_thread(thumb_store.set, key, data)
+    return data, _media_type(data)
@@ -0,0 +1,28 @@
+# core/timing.py
+import asyncio
+import logging
+from time import perf_counter
+
+cloud_logger = logging.getLogger("bookshelf")
+
+
+async def timed(name: str, aw, timings: dict, timeout: float, default=None):
+    """Await one page section with its own timeout.
+
+    Records the elapsed milliseconds in ``timings[name]``. A section that
+    fails or times out logs a warning and returns ``default`` so the rest of
+    the page can still render.
+    """
+    start = perf_counter()
+    try:
+        return await asyncio.wait_for(aw, timeout)
+    except Exception as e:
+        cloud_logger.warning(f"⚠️ Section '{name}' failed: {e!r}")
+        return default
+    finally:
+        timings[name] = (perf_counter() - start) * 1000
+
+
+def server_timing(timings: dict) -> str:
+    """Format section timings as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
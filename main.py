@@ -1,9 +1,17 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from dotenv import load_dotenv
-from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
-from routers import auth, books, favorites, shelves, pages
+from routers import auth, books, favorites, shelves, pages, thumbs
+from core.http import start_http_client, close_http_client
+from core import db
+from core.activity import activity_buffer
+from core.compression import CompressionMiddleware
+from core.etag import PageCacheMiddleware
+from core.static import FingerprintedStaticFiles
+from core.templates import precompile_templates
 import google.cloud.logging
 from google.cloud.logging.handlers import CloudLoggingHandler
 import logging
@@ -16,7 +24,31 @@ if "SERVICE_ACCOUNT_JSON" in os.environ:
     with open(sa_path, "w") as f:
         f.write(os.environ["SERVICE_ACCOUNT_JSON"])
     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = sa_path
-app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client for Google Books / NYT / Open Library / iTunes
+    await start_http_client()
+    # Compile (or load cached bytecode for) every template before serving
+    precompile_templates()
+    # Batched recently_viewed / search_history writes
+    activity_buffer.start()
+    # Keep carousel caches warm so homepage requests never pay the rebuild
+    refresher = None
+    if os.getenv("CAROUSEL_REFRESHER", "true").lower() in ("1", "true", "yes"):
+        refresher = asyncio.create_task(pages.carousel_refresher())
+    yield
+    if refresher:
+        refresher.cancel()
+        with suppress(asyncio.CancelledError):
+            await refresher
+    await activity_buffer.stop()
+    await close_http_client()
+    db.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     SessionMiddleware,
@@ -26,6 +58,9 @@ app.add_middleware(
     same_site="lax",
     https_only=False  # True if using HTTPS in production
 )
+# Outermost last: pages get their ETag from the uncompressed body
+app.add_middleware(PageCacheMiddleware)
+app.add_middleware(CompressionMiddleware)
 
 # Ensure the environment variable points to your key file
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
@@ -46,11 +81,12 @@ except Exception as e:
     cloud_logger.warning(f"⚠️ Could not initialize Cloud Logging: {e}")
 # Mount static files (CSS, JS, images, etc.)
 if os.path.isdir("static"):
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.mount("/static", FingerprintedStaticFiles(directory="static"), name="static")
 
 # Register routers
 app.include_router(auth.router)
 app.include_router(books.router)
 app.include_router(favorites.router)
 app.include_router(shelves.router)
-app.include_router(pages.router)
\ No newline at end of file
+app.include_router(pages.router)
+app.include_router(thumbs.router)
\ No newline at end of file
@@ -1,15 +1,16 @@
 # routers/auth.py
 from fastapi import APIRouter, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from supabase_client import supabase
+from supabase_auth import SyncMemoryStorage
+from supabase_client import supabase, create_auth_client
+from core import db
+from core.templates import templates
 import os, logging
 from urllib.parse import urlencode
 
 cloud_logger = logging.getLogger("bookshelf")
 
 router = APIRouter(tags=["auth"])
-templates = Jinja2Templates(directory="templates")
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 # Automatically use local or deployed redirect URL
@@ -26,8 +27,8 @@ async def login_page(request: Request):
 @router.post("/login")
 async def login(request: Request, email: str = Form(...), password: str = Form(...)):
     try:
-        session = supabase.auth.sign_in_with_password(
-            {"email": email, "password": password}
+        session = await db.run(
+            _sign_in_with_password, {"email": email, "password": password}
         )
         if not session.user:
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -81,12 +82,13 @@ async def signup(
             )
 
         # Create user in Supabase with metadata for username
-        user = supabase.auth.sign_up(
+        user = await db.run(
+            _sign_up,
             {
                 "email": email,
                 "password": password,
                 "options": {"data": {"username": username}},
-            }
+            },
         )
 
         if user.user:
@@ -121,7 +123,7 @@ async def signup(
 
 # --- Google Login (OAuth) ---
 @router.get("/login/google")
-async def google_login():
+async def google_login(request: Request):
     """Start Supabase Google OAuth (PKCE flow)."""
     try:
         # Use the environment variable for redirect URL
@@ -132,15 +134,19 @@ async def google_login():
         cloud_logger.info(f"🔐 Starting Google OAuth with redirect: {redirect_to}")
 
         # Use Supabase's built-in OAuth sign-in
-        response = supabase.auth.sign_in_with_oauth(
+        response, code_verifier = await db.run(
+            _start_oauth,
             {
                 "provider": "google",
                 "options": {
                     "redirect_to": redirect_to,
                     "query_params": {"access_type": "offline", "prompt": "consent"},
                 },
-            }
+            },
         )
+        # The callback may land on another worker: keep the PKCE verifier in
+        # the signed session cookie rather than in a client's memory
+        request.session["pkce_verifier"] = code_verifier
 
         if response and hasattr(response, "url"):
             cloud_logger.info(f"🔗 Redirecting to: {response.url}")
@@ -193,38 +199,9 @@ async def auth_callback(request: Request):
 
         # Exchange the code for a session
         try:
-            session = supabase.auth.exchange_code_for_session({"auth_code": code})
-
-            if not session or not session.user:
-                cloud_logger.error("Code exchange failed - no session or user")
-                raise HTTPException(status_code=401, detail="Code exchange failed")
-
-            user = session.user
-
-            # --- Handle Google user username setup ---
-            username = None
-
-            # If metadata already has a username, use it
-            if user.user_metadata and "username" in user.user_metadata:
-                username = user.user_metadata["username"]
-            else:
-                # Otherwise create one from full_name or email prefix
-                base_name = None
-                if user.user_metadata and "full_name" in user.user_metadata:
-                    base_name = user.user_metadata["full_name"].split(" ")[0]
-                else:
-                    base_name = user.email.split("@")[0]
-                username = base_name
-
-                # Save username in Supabase metadata
-                try:
-                    supabase.auth.update_user({"data": {"username": username}})
-                    # Refresh user info so the session gets updated metadata
-                    refreshed = supabase.auth.get_user(session.session.access_token)
-                    if refreshed and refreshed.user:
-                        user = refreshed.user
-                except Exception as meta_err:
-                    cloud_logger.warning(f"Could not set username metadata: {meta_err}")
+            session, user, username = await db.run(
+                _complete_oauth, code, request.session.pop("pkce_verifier", None)
+            )
 
             # --- Store user in session ---
             request.session["user"] = {
@@ -294,7 +271,11 @@ async def forgot_password(request: Request, email: str = Form(...)):
         redirect_url = os.getenv(
             "SUPABASE_RESET_REDIRECT", "http://127.0.0.1:8000/reset-password"
         )
-        supabase.auth.reset_password_for_email(email, {"redirect_to": redirect_url})
+        await db.run(
+            supabase.auth.reset_password_for_email,
+            email,
+            {"redirect_to": redirect_url},
+        )
         cloud_logger.info(f"📩 Password reset email sent to {email}")
 
         # ✅ Redirect to login with success message
@@ -322,11 +303,7 @@ async def reset_password(
         if not access_token or not refresh_token:
             return RedirectResponse(url="/login?reset=invalid", status_code=302)
 
-        # Authenticate temporarily
-        supabase.auth.set_session(access_token, refresh_token)
-
-        # Update password
-        supabase.auth.update_user({"password": password})
+        await db.run(_reset_password, access_token, refresh_token, password)
 
         # ✅ Redirect to login with reset success message
         return RedirectResponse(url="/login?reset=success", status_code=302)
@@ -334,3 +311,74 @@ async def reset_password(
     except Exception as e:
         print("Reset error:", e)
         return RedirectResponse(url="/login?reset=failed", status_code=302)
+
+
+# --- Stateful auth flows ---
+# Each runs start to finish on its own client inside one db.run call, so no
+# other request's session can slip in between the steps.
+def _sign_in_with_password(credentials):
+    return create_auth_client().auth.sign_in_with_password(credentials)
+
+
+def _sign_up(credentials):
+    return create_auth_client().auth.sign_up(credentials)
+
+
+def _start_oauth(credentials):
+    """OAuth URL plus the PKCE code verifier the callback must present."""
+    storage = SyncMemoryStorage()
+    response = create_auth_client(storage).auth.sign_in_with_oauth(credentials)
+    code_verifier = next(
+        (v for k, v in storage.storage.items() if k.endswith("-code-verifier")),
+        None,
+    )
+    return response, code_verifier
+
+
+def _complete_oauth(code, code_verifier):
+    """Exchange the OAuth code and make sure the user has a username."""
+    client = create_auth_client()
+    session = client.auth.exchange_code_for_session(
+        {"auth_code": code, "code_verifier": code_verifier}
+    )
+
+    if not session or not session.user:
+        cloud_logger.error("Code exchange failed - no session or user")
+        raise HTTPException(status_code=401, detail="Code exchange failed")
+
+    user = session.user
+
+    # --- Handle Google user username setup ---
+    username = None
+
+    # If metadata already has a username, use it
+    if user.user_metadata and "username" in user.user_metadata:
+        username = user.user_metadata["username"]
+    else:
+        # Otherwise create one from full_name or email prefix
+        base_name = None
+        if user.user_metadata and "full_name" in user.user_metadata:
+            base_name = user.user_metadata["full_name"].split(" ")[0]
+        else:
+            base_name = user.email.split("@")[0]
+        username = base_name
+
+        # Save username in Supabase metadata
+        try:
+            client.auth.update_user({"data": {"username": username}})
+            # Refresh user info so the session gets updated metadata
+            refreshed = client.auth.get_user(session.session.access_token)
+            if refreshed and refreshed.user:
+                user = refreshed.user
+        except Exception as meta_err:
+            cloud_logger.warning(f"Could not set username metadata: {meta_err}")
+
+    return session, user, username
+
+
+def _reset_password(access_token, refresh_token, password):
+    client = create_auth_client()
+    # Authenticate temporarily
+    client.auth.set_session(access_token, refresh_token)
+    # Update password
+    client.auth.update_user({"password": password})
@@ -1,55 +1,90 @@
 # routers/books.py
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Request, Body
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from typing import Optional
 import os
+import asyncio
 import urllib.parse
 from supabase_client import supabase
+from core import db
 from core.security import get_current_user_email
-import httpx
+from core.http import get_http_client
+from core.timing import timed, server_timing
+from core.books_cache import get_cached_book, save_book, save_books
+from core.search_cache import (
+    normalize_query,
+    get_cached_search,
+    save_search,
+    search_cache,
+)
+from core.projection import slim_volumes
+from core.singleflight import SingleFlight, spawn
+from core.history import get_history, remember_search, history_labels
+from core.activity import activity_buffer
+from core.templates import templates
+from core.snapshots import note_view
+from core.membership import load_membership, load_shelf_rows
 import logging
 import urllib.parse
 
 cloud_logger = logging.getLogger("bookshelf")
 
-CACHE_EXPIRY_HOURS = 72  # adjust to taste (3 days)
+DETAIL_TIMEOUT = float(os.getenv("BOOK_DETAIL_TIMEOUT", "5"))  # per lookup
+# search.html shows 200 chars of blurb; one more tells it to add "..."
+SEARCH_DESCRIPTION_CHARS = 201
+SEARCH_PAGE_SIZE = min(
+    int(os.getenv("SEARCH_PAGE_SIZE", "20")), 40
+)  # Google caps at 40
 
 router = APIRouter(tags=["books"])
-templates = Jinja2Templates(directory="templates")
 
 GOOGLE_BOOKS_API = "https://www.googleapis.com/books/v1/volumes"
 API_KEY = os.getenv("GOOGLE_BOOKS_API_KEY")
 
+# Coalesce identical in-flight upstream fetches
+volume_flight = SingleFlight("volume")
+search_flight = SingleFlight("search")
+
+
+# --- helper functions ---
+async def _open_library_link(client, isbn: str):
+    ol = await client.get(
+        f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data",
+        timeout=5,
+    )
+    if ol.status_code == 200:
+        data = ol.json()
+        if f"ISBN:{isbn}" in data:
+            return data[f"ISBN:{isbn}"].get("url")
+    return None
+
+
+async def _apple_books_link(client, isbn: str):
+    ab = await client.get(
+        f"https://itunes.apple.com/search?term={isbn}&entity=ebook&country=us",
+        timeout=5,
+    )
+    if ab.status_code == 200:
+        data = ab.json()
+        if data.get("resultCount", 0) > 0:
+            return data["results"][0].get("trackViewUrl")
+    return None
+
 
-# --- helper function ---
 async def fetch_other_links(isbn: str):
     links = {}
-    async with httpx.AsyncClient() as client:
-        try:
-            # Open Library
-            ol = await client.get(
-                f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data",
-                timeout=5,
-            )
-            if ol.status_code == 200:
-                data = ol.json()
-                if f"ISBN:{isbn}" in data:
-                    links["Open Library"] = data[f"ISBN:{isbn}"].get("url")
-
-            # Apple Books
-            ab = await client.get(
-                f"https://itunes.apple.com/search?term={isbn}&entity=ebook&country=us",
-                timeout=5,
-            )
-            if ab.status_code == 200:
-                data = ab.json()
-                if data.get("resultCount", 0) > 0:
-                    links["Apple Books"] = data["results"][0].get("trackViewUrl")
-
-        except Exception as e:
-            print("Other link fetch error:", e)
+    client = get_http_client()
+    # Open Library and Apple Books are independent, query both at once
+    results = await asyncio.gather(
+        _open_library_link(client, isbn),
+        _apple_books_link(client, isbn),
+        return_exceptions=True,
+    )
+    for store, result in zip(["Open Library", "Apple Books"], results):
+        if isinstance(result, Exception):
+            print(f"Other link fetch error ({store}):", result)
+        elif result:
+            links[store] = result
 
     # always include fallback searches
     links["Amazon"] = f"https://www.amazon.com/s?k={isbn}"
@@ -57,9 +92,101 @@ async def fetch_other_links(isbn: str):
     return links
 
 
+async def fetch_google_volume(book_id: str):
+    """Fetch a volume by ID, falling back to an ISBN search."""
+    client = get_http_client()
+    # Try volumeId first
+    try:
+        url = f"{GOOGLE_BOOKS_API}/{book_id}?key={API_KEY}"
+        response = await client.get(url, timeout=10.0)
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("volumeInfo"):
+                return data
+    except Exception as e:
+        print("Volume ID fetch error:", e)
+
+    # If not found, try ISBN fallback (same pooled connection)
+    try:
+        url = f"{GOOGLE_BOOKS_API}?q=isbn:{book_id}&key={API_KEY}"
+        response = await client.get(url, timeout=10.0)
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("totalItems", 0) > 0:
+                return data["items"][0]
+    except Exception as e:
+        print("ISBN fetch error:", e)
+    return None
+
+
+async def search_google_books(
+    query: str, start: int = 0, max_results: int = SEARCH_PAGE_SIZE
+):
+    try:
+        url = (
+            f"{GOOGLE_BOOKS_API}?q={urllib.parse.quote(query)}"
+            f"&startIndex={start}&maxResults={max_results}&key={API_KEY}"
+        )
+        response = await get_http_client().get(url, timeout=10.0)
+        if response.status_code == 200:
+            data = response.json()
+            return data.get("items", [])
+    except Exception as e:
+        print("Google Books API error:", e)
+    return []
+
+
+def _page_key(key: str, start: int) -> str:
+    return f"{key}@{start}" if start else key
+
+
+async def load_search(key: str, start: int = 0):
+    """Search Google and cache the page; volumes also land in books_cache."""
+    items = await search_google_books(key, start)
+    if items:
+        spawn(save_books(items))  # full volumes, for the detail page
+        items = slim_volumes(items, SEARCH_DESCRIPTION_CHARS)
+        await save_search(_page_key(key, start), items)
+    return items
+
+
+async def _fetch_page(key: str, start: int):
+    page_key = _page_key(key, start)
+    books = await get_cached_search(page_key)
+    if books is None:
+        # Identical concurrent searches share one Google call
+        books = await search_flight.do(page_key, load_search, key, start)
+    return books
+
+
+async def get_search_page(key: str, start: int = 0):
+    """One page of results plus the next cursor (None on the last page)."""
+    books = await _fetch_page(key, start)
+    if len(books) < SEARCH_PAGE_SIZE:
+        return books, None
+
+    # Warm the next page while the user reads this one
+    next_start = start + len(books)
+    next_key = _page_key(key, next_start)
+    if next_key not in search_cache and not search_flight.in_flight(next_key):
+        spawn(_fetch_page(key, next_start))
+    return books, next_start
+
+
+async def load_volume(book_id: str):
+    """Fetch a volume from Google and cache it; run once per book_id at a time."""
+    book_data = await fetch_google_volume(book_id)
+    if book_data:
+        # Only the request that did the fetch writes the cache row
+        spawn(save_book(book_id, book_data))
+    return book_data
+
+
 @router.get("/search", response_class=HTMLResponse)
 async def search_books(
-    request: Request, q: Optional[str] = None, filter: Optional[str] = ""
+    request: Request,
+    q: Optional[str] = None,
+    filter: Optional[str] = "",
 ):
     user = request.session.get("user")
     if not user:
@@ -67,70 +194,23 @@ async def search_books(
     user_email = user["email"]
 
     books = []
+    next_start = None
+    membership = {}
     query = f"{filter}:{q}" if filter else q
 
-    # --- Save query to Supabase search history (prevent duplicates) ---
-
+    # --- Search history: ring buffer now, batched upsert via write-behind ---
+    search_history_raw = await get_history(user_email)
     if query:
-        existing = (
-            supabase.table("search_history")
-            .select("id")
-            .eq("user_email", user_email)
-            .eq("query", query)
-            .execute()
-            .data
-        )
-
-        if existing:
-            # ✅ Update timestamp instead of adding duplicate
-            supabase.table("search_history").update(
-                {"created_at": datetime.utcnow().isoformat()}
-            ).eq("id", existing[0]["id"]).execute()
-        else:
-            # ✅ Insert new if not found
-            supabase.table("search_history").insert(
-                {"user_email": user_email, "query": query}
-            ).execute()
-
-    # --- Fetch last 10 searches for display ---
-    history_res = (
-        supabase.table("search_history")
-        .select("query")
-        .eq("user_email", user_email)
-        .order("created_at", desc=True)
-        .limit(10)
-        .execute()
-    )
-    search_history_raw = (
-        [h["query"] for h in history_res.data] if history_res.data else []
-    )
-
-    search_history_display = []
-    for item in search_history_raw:
-        if item.startswith("inauthor:"):
-            label = "Author: " + item.replace("inauthor:", "")
-        elif item.startswith("intitle:"):
-            label = "Title: " + item.replace("intitle:", "")
-        elif item.startswith("subject:"):
-            label = "Category: " + item.replace("subject:", "")
-        else:
-            label = item
-        search_history_display.append(label)
+        search_history_raw = remember_search(user_email, query)
+        activity_buffer.record_search(user_email, query)
 
-    search_history_zipped = list(zip(search_history_raw, search_history_display))
+    search_history_zipped = history_labels(search_history_raw)
 
     # --- Fetch books from Google Books API ---
     if query:
-        async with httpx.AsyncClient() as client:
-            try:
-                cloud_logger.info(f"🔍 User {user} searched for: {query}")
-                url = f"{GOOGLE_BOOKS_API}?q={urllib.parse.quote(query)}&key={API_KEY}"
-                response = await client.get(url, timeout=10.0)
-                if response.status_code == 200:
-                    data = response.json()
-                    books = data.get("items", [])
-            except Exception as e:
-                print("Google Books API error:", e)
+        cloud_logger.info(f"🔍 User {user} searched for: {query}")
+        books, next_start = await get_search_page(normalize_query(q, filter))
+        membership = await _card_membership(user_email, books)
 
     return templates.TemplateResponse(
         "search.html",
@@ -139,12 +219,64 @@ async def search_books(
             "books": books,
             "query": q,
             "filter": filter,
+            "next_start": next_start,
+            "membership": membership,
             "user": user,
             "search_history_zipped": search_history_zipped,
         },
     )
 
 
+@router.get("/api/search")
+async def api_search(
+    request: Request,
+    q: Optional[str] = None,
+    filter: Optional[str] = "",
+    start: int = 0,
+):
+    """Next page for infinite scroll: rendered result cards plus the cursor."""
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+    key = normalize_query(q, filter)
+    if not key:
+        return {"html": "", "count": 0, "next_start": None}
+
+    books, next_start = await get_search_page(key, max(start, 0))
+    membership = await _card_membership(user["email"], books)
+    html = templates.get_template("search_results.html").render(
+        books=books, membership=membership
+    )
+    return {"html": html, "count": len(books), "next_start": next_start}
+
+
+@router.post("/api/membership")
+async def api_membership(request: Request, data: dict = Body(...)):
+    """Favorite/shelf state for a batch of cards: ``{"book_ids": [...]}``."""
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+    book_ids = data.get("book_ids")
+    if not isinstance(book_ids, list) or not all(isinstance(b, str) for b in book_ids):
+        return JSONResponse(
+            {"error": "book_ids must be a list of strings"}, status_code=400
+        )
+    return await load_membership(user["email"], book_ids)
+
+
+async def _card_membership(user_email: str, books) -> dict:
+    # Cards still render (without badges) if the lookup is slow or fails
+    return await timed(
+        "membership",
+        load_membership(user_email, [b["id"] for b in books]),
+        {},
+        DETAIL_TIMEOUT,
+        {},
+    )
+
+
 @router.get("/book/{book_id}", response_class=HTMLResponse)
 async def book_detail(book_id: str, request: Request):
     user = request.session.get("user")
@@ -152,68 +284,36 @@ async def book_detail(book_id: str, request: Request):
         return RedirectResponse(url="/login")
     user_email = user["email"]
 
-    # --- Check cache ---
-    cache_result = (
-        supabase.table("books_cache")
-        .select("data, created_at")
-        .eq("id", book_id)
-        .execute()
-        .data
+    # --- Round trip 1: all independent reads at once ---
+    timings = {}
+    book_data, fav_check, shelves, shelf_books_rows = await asyncio.gather(
+        timed("books_cache", get_cached_book(book_id), timings, DETAIL_TIMEOUT),
+        timed(
+            "favorite",
+            _load_favorite(user_email, book_id),
+            timings,
+            DETAIL_TIMEOUT,
+            [],
+        ),
+        timed("shelves", _load_shelves(user_email), timings, DETAIL_TIMEOUT, []),
+        timed(
+            "shelf_books",
+            _load_shelf_books(user_email, book_id),
+            timings,
+            DETAIL_TIMEOUT,
+            [],
+        ),
     )
 
-    book_data = None
-    if cache_result:
-        cached = cache_result[0]
-        created_at = datetime.fromisoformat(cached["created_at"].ljust(26, "0"))
-        if datetime.utcnow() - created_at < timedelta(hours=CACHE_EXPIRY_HOURS):
-            book_data = cached["data"]
-
     # --- Fetch from Google Books if not cached ---
     if not book_data:
-        async with httpx.AsyncClient() as client:
-            # Try volumeId first
-            try:
-                url = f"{GOOGLE_BOOKS_API}/{book_id}?key={API_KEY}"
-                response = await client.get(url, timeout=10.0)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("volumeInfo"):
-                        book_data = data
-            except Exception as e:
-                print("Volume ID fetch error:", e)
-
-            # If not found, try ISBN fallback (still inside same client)
-            if not book_data:
-                try:
-                    url = f"{GOOGLE_BOOKS_API}?q=isbn:{book_id}&key={API_KEY}"
-                    response = await client.get(url, timeout=10.0)
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data.get("totalItems", 0) > 0:
-                            book_data = data["items"][0]
-                except Exception as e:
-                    print("ISBN fetch error:", e)
-
-        # Cache the result
-        if book_data:
-            try:
-                title = book_data["volumeInfo"].get("title")
-                authors = book_data["volumeInfo"].get("authors", [])
-                thumbnail = (
-                    book_data["volumeInfo"].get("imageLinks", {}).get("thumbnail")
-                )
-                supabase.table("books_cache").upsert(
-                    {
-                        "id": book_id,
-                        "title": title,
-                        "authors": authors,
-                        "thumbnail": thumbnail,
-                        "data": book_data,
-                        "created_at": datetime.utcnow().isoformat(),
-                    }
-                ).execute()
-            except Exception as e:
-                print("Cache insert error:", e)
+        # Concurrent viewers of the same uncached book share one fetch
+        book_data = await timed(
+            "google",
+            volume_flight.do(book_id, load_volume, book_id),
+            timings,
+            DETAIL_TIMEOUT * 2,
+        )
 
     # --- Not found handler ---
     if not book_data:
@@ -223,65 +323,21 @@ async def book_detail(book_id: str, request: Request):
             status_code=404,
         )
 
-    # --- Log user viewing the book (safe handling) ---
-    volume_info = (book_data or {}).get("volumeInfo", {})
-    title = volume_info.get("title", "Unknown Title")
+    # --- Log user viewing the book ---
+    title = book_data.get("volumeInfo", {}).get("title", "Unknown Title")
+    cloud_logger.info(f"👁️ {user_email} opened book: '{title}' (ID: {book_id})")
 
-    if book_data:
-        cloud_logger.info(f"👁️ {user_email} opened book: '{title}' (ID: {book_id})")
-    else:
-        cloud_logger.warning(
-            f"⚠️ {user_email} tried to open a non-existent or invalid book (ID: {book_id})"
-        )
-
-    # --- Favorites ---
-    fav_check = (
-        supabase.table("favorites")
-        .select("id")
-        .eq("user_email", user_email)
-        .eq("book_id", book_id)
-        .execute()
-        .data
-    )
     is_favorite = bool(fav_check)
+    shelf_books = [s["shelf_id"] for s in shelf_books_rows]
 
-    # --- Shelves ---
-    shelves_res = (
-        supabase.table("shelves").select("*").eq("user_email", user_email).execute()
-    )
-    shelves = shelves_res.data or []
+    # --- Save recently viewed book (buffered, flushed to Supabase in bulk) ---
+    view_title = book_data["volumeInfo"].get("title", "Untitled")
+    view_thumb = book_data["volumeInfo"].get("imageLinks", {}).get("thumbnail", "")
+    activity_buffer.record_view(user_email, book_id, view_title, view_thumb)
+    # Keep the cached homepage's "recently viewed" current too
+    note_view(user_email, book_id, view_title, view_thumb)
 
-    shelf_books_res = (
-        supabase.table("shelf_books")
-        .select("shelf_id, book_id")
-        .eq("book_id", book_id)
-        .execute()
-    )
-    shelf_books = (
-        [s["shelf_id"] for s in shelf_books_res.data] if shelf_books_res.data else []
-    )
-
-    # --- Save recently viewed book in Supabase ---
-    if book_data:
-        title = book_data["volumeInfo"].get("title", "Untitled")
-        thumbnail = book_data["volumeInfo"].get("imageLinks", {}).get("thumbnail", "")
-
-        # Remove duplicates
-        supabase.table("recently_viewed").delete().eq("user_email", user_email).eq(
-            "book_id", book_id
-        ).execute()
-
-        # Insert latest viewed book
-        supabase.table("recently_viewed").insert(
-            {
-                "user_email": user_email,
-                "book_id": book_id,
-                "title": title,
-                "thumbnail": thumbnail,
-            }
-        ).execute()
-
-        # --- Extract ISBN for external sources ---
+    # --- Extract ISBN for external sources ---
     isbn = None
     for ident in book_data.get("volumeInfo", {}).get("industryIdentifiers", []):
         if ident["type"] == "ISBN_13":
@@ -290,10 +346,15 @@ async def book_detail(book_id: str, request: Request):
         elif not isbn and ident["type"] == "ISBN_10":
             isbn = ident["identifier"]
 
-    other_links = await fetch_other_links(isbn) if isbn else {}
+    # --- Round trip 2: external store links (queried in parallel) ---
+    other_links = (
+        await timed("other_links", fetch_other_links(isbn), timings, DETAIL_TIMEOUT, {})
+        if isbn
+        else {}
+    )
 
     # --- Render ---
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "book_detail.html",
         {
             "request": request,
@@ -305,3 +366,27 @@ async def book_detail(book_id: str, request: Request):
             "other_links": other_links,  # ⬅️ new context
         },
     )
+    response.headers["Server-Timing"] = server_timing(timings)
+    return response
+
+
+# --- book detail reads ---
+async def _load_favorite(user_email: str, book_id: str):
+    res = await db.execute(
+        supabase.table("favorites")
+        .select("id")
+        .eq("user_email", user_email)
+        .eq("book_id", book_id)
+    )
+    return res.data or []
+
+
+async def _load_shelves(user_email: str):
+    res = await db.execute(
+        supabase.table("shelves").select("*").eq("user_email", user_email)
+    )
+    return res.data or []
+
+
+async def _load_shelf_books(user_email: str, book_id: str):
+    return await load_shelf_rows(user_email, [book_id])
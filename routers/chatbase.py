@@ -1,6 +1,7 @@
 # routers/chatbase.py
 from fastapi import APIRouter, Request
-import os, httpx
+import os
+from core.http import get_http_client
 
 router = APIRouter(prefix="/chatbase", tags=["Chatbase"])
 
@@ -22,10 +23,9 @@ async def chatbase_message(request: Request):
         "Content-Type": "application/json"
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://www.chatbase.co/api/v1/chat",
-            json=payload,
-            headers=headers
-        )
-        return response.json()
+    response = await get_http_client().post(
+        "https://www.chatbase.co/api/v1/chat",
+        json=payload,
+        headers=headers
+    )
+    return response.json()
@@ -1,12 +1,16 @@
 # routers/favorites.py
-import urllib.request, json
 import os
 
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from supabase_client import supabase
+from core import db
 from core.security import get_current_user_email
+from core.http import get_http_client
+from core.books_cache import get_cached_book
+from core.templates import templates
+from core.snapshots import invalidate_homepage
+from core.genres import bump_genres
 import logging
 from fastapi import Body
 
@@ -14,7 +18,6 @@ cloud_logger = logging.getLogger("bookshelf")
 
 
 router = APIRouter(tags=["favorites"])
-templates = Jinja2Templates(directory="templates")
 
 API_KEY = os.getenv("GOOGLE_BOOKS_API_KEY")
 
@@ -26,8 +29,8 @@ async def view_favorites(request: Request):
     if not user:
         return RedirectResponse(url="/login", status_code=302)
     user_email = user["email"]
-    result = (
-        supabase.table("favorites").select("*").eq("user_email", user_email).execute()
+    result = await db.execute(
+        supabase.table("favorites").select("*").eq("user_email", user_email)
     )
     favorites = result.data or []
 
@@ -45,16 +48,22 @@ async def remove_favorite(request: Request, book_id: str = Form(...)):
         return RedirectResponse(url="/login", status_code=302)
     user_email = user["email"]
     cloud_logger.info(f"💔 {user_email} removed book {book_id} from favorites")
-    supabase.table("favorites").delete().eq("user_email", user).eq(
-        "book_id", book_id
-    ).execute()
+    removed = await db.execute(
+        supabase.table("favorites")
+        .delete()
+        .eq("user_email", user_email)
+        .eq("book_id", book_id)
+    )
+    for fav in removed.data or []:
+        await bump_genres(user_email, fav.get("categories"), -1)
+    invalidate_homepage(user_email)
 
     return RedirectResponse(url=f"/favorites", status_code=303)
 
 
 @router.post("/favorite-json")
 async def toggle_favorite_json(request: Request, data: dict = Body(...)):
-    user_email = get_current_user_email(request)
+    user_email = await get_current_user_email(request)
     if not user_email:
         return {"success": False, "message": "Unauthorized"}
 
@@ -66,9 +75,15 @@ async def toggle_favorite_json(request: Request, data: dict = Body(...)):
 
     if is_favorite:
         # 💔 Remove from favorites
-        supabase.table("favorites").delete().eq("user_email", user_email).eq(
-            "book_id", book_id
-        ).execute()
+        removed = await db.execute(
+            supabase.table("favorites")
+            .delete()
+            .eq("user_email", user_email)
+            .eq("book_id", book_id)
+        )
+        for fav in removed.data or []:
+            await bump_genres(user_email, fav.get("categories"), -1)
+        invalidate_homepage(user_email)
         cloud_logger.info(f"💔 {user_email} removed {book_id} from favorites")
         return {"success": True, "action": "removed"}
 
@@ -76,15 +91,9 @@ async def toggle_favorite_json(request: Request, data: dict = Body(...)):
         # --- Try to get categories from cached book data ---
         categories = ""
         try:
-            cached = (
-                supabase.table("books_cache")
-                .select("data")
-                .eq("id", book_id)
-                .execute()
-                .data
-            )
-            if cached and "volumeInfo" in cached[0]["data"]:
-                cats = cached[0]["data"]["volumeInfo"].get("categories", [])
+            cached = await get_cached_book(book_id)
+            if cached and "volumeInfo" in cached:
+                cats = cached["volumeInfo"].get("categories", [])
                 if cats:
                     categories = ", ".join(cats)
         except Exception as e:
@@ -93,37 +102,38 @@ async def toggle_favorite_json(request: Request, data: dict = Body(...)):
         # --- Fallback: fetch directly from Google Books if not cached ---
         if not categories:
             try:
-                import urllib.request
-
                 url = f"https://www.googleapis.com/books/v1/volumes/{book_id}?key={API_KEY}"
-                with urllib.request.urlopen(url) as response:
-                    data = json.loads(response.read())
-                    cats = data.get("volumeInfo", {}).get("categories", [])
-                    if cats:
-                        categories = ", ".join(cats)
+                response = await get_http_client().get(url, timeout=10.0)
+                volume = response.json()
+                cats = volume.get("volumeInfo", {}).get("categories", [])
+                if cats:
+                    categories = ", ".join(cats)
             except Exception as e:
                 print("⚠️ Could not fetch categories:", e)
 
         # --- Save favorite with categories ---
-        existing = (
+        existing = await db.execute(
             supabase.table("favorites")
             .select("*")
             .eq("user_email", user_email)
             .eq("book_id", book_id)
-            .execute()
         )
 
         if not existing.data:
-            supabase.table("favorites").insert(
-                {
-                    "user_email": user_email,
-                    "book_id": book_id,
-                    "title": title,
-                    "authors": authors,
-                    "thumbnail": thumbnail,
-                    "categories": categories,
-                }
-            ).execute()
+            await db.execute(
+                supabase.table("favorites").insert(
+                    {
+                        "user_email": user_email,
+                        "book_id": book_id,
+                        "title": title,
+                        "authors": authors,
+                        "thumbnail": thumbnail,
+                        "categories": categories,
+                    }
+                )
+            )
+            await bump_genres(user_email, categories, 1)
+            invalidate_homepage(user_email)
 
         cloud_logger.info(
             f"💖 {user_email} added '{title}' with categories: {categories}"
@@ -2,56 +2,187 @@
 
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
 from supabase_client import supabase
+from core import db
 from core.security import get_current_user_email
+from core.http import get_http_client
+from core.timing import timed, server_timing
+from core.cache import TTLCache, cache_stats
+from core.singleflight import SingleFlight, spawn
+from core.fanout import bounded_stream
+from core.history import get_history, history_labels, forget_history
+from core.activity import activity_buffer
+from core.projection import slim_volume, slim_volumes
+from core.etag import strong_etag, not_modified
+from core.snapshots import get_snapshot, save_snapshot, invalidate_homepage
+from core.genres import load_genres, rank_genres
+from core.backends import make_backend
+from core.leases import claim_lease
+from core.templates import templates
 import urllib.parse
 import os
-import httpx
 import asyncio
-from time import time
+import logging
+from contextlib import aclosing
 from datetime import datetime, timezone, timedelta
 
-featured_cache = (
-    {}
-)  # { user_email: { "data": [...], "genres": [...], "timestamp": <unix_time> } }
-
+cloud_logger = logging.getLogger("bookshelf")
 
 API_KEY = os.getenv("GOOGLE_BOOKS_API_KEY")
 NYT_KEY = os.getenv("NYT_BOOKS_API_KEY")
 ADMIN_TOKEN = os.getenv("CAROUSEL_ADMIN_TOKEN", "secret-refresh")
 CACHE_TTL_DAYS = 7  # refresh once a week
+CAROUSEL_FILTERS = ("month", "top", "featured")
+# Background refresher: how often it wakes up, and how early before expiry it rebuilds
+CAROUSEL_REFRESH_INTERVAL = float(os.getenv("CAROUSEL_REFRESH_INTERVAL", "3600"))
+CAROUSEL_REFRESH_AHEAD = timedelta(
+    hours=float(os.getenv("CAROUSEL_REFRESH_AHEAD_HOURS", "12"))
+)
+# Cross-worker lease on a rebuild; expires on its own if the holder dies
+CAROUSEL_LEASE_SECONDS = int(os.getenv("CAROUSEL_LEASE_SECONDS", "600"))
+FEATURED_TTL_SECONDS = 6 * 60 * 60  # personalized featured: 6 hours
+FEATURED_PER_GENRE = 4
+# genre (lowercased) -> slim volumes. Shared by every user with that genre in
+# their top 3, so upstream calls scale with distinct genres, not users.
+featured_pool = make_backend(
+    "featured_pool",
+    max_bytes=int(os.getenv("FEATURED_POOL_MAX_BYTES", str(4 * 1024 * 1024))),
+    ttl_seconds=FEATURED_TTL_SECONDS,
+)
+featured_flight = SingleFlight("featured")
+# Carousel JSON: browsers reuse it briefly, then revalidate with If-None-Match.
+# private because every response also refreshes the session cookie.
+API_BOOKS_CACHE_CONTROL = os.getenv(
+    "API_BOOKS_CACHE_CONTROL", "private, max-age=60, must-revalidate"
+)
+
+# Per-section budgets for the homepage fan-out
+SECTION_TIMEOUT = float(os.getenv("HOMEPAGE_SECTION_TIMEOUT", "5"))
+CAROUSEL_TIMEOUT = float(os.getenv("HOMEPAGE_CAROUSEL_TIMEOUT", "30"))
+
+carousel_flight = SingleFlight("carousel")
+# Carousel rows change weekly; re-read briefly cached copies to pick up other
+# instances' rebuilds without a query per homepage hit
+carousel_rows = TTLCache(
+    "carousel_rows",
+    max_bytes=2 * 1024 * 1024,
+    ttl_seconds=int(os.getenv("CAROUSEL_ROW_CACHE_SECONDS", "60")),
+)
+
+# Carousel rebuilds: parallel genre queries, merged in genre order
+CAROUSEL_FANOUT_CONCURRENCY = int(os.getenv("CAROUSEL_FANOUT_CONCURRENCY", "7"))
+
+# NYT list enrichment: bounded Google lookups + title/author → volume map
+NYT_MAX_BOOKS = 12
+NYT_ENRICH_CONCURRENCY = int(os.getenv("NYT_ENRICH_CONCURRENCY", "5"))
+NYT_ENRICH_TIMEOUT = float(os.getenv("NYT_ENRICH_TIMEOUT", "5"))
+nyt_volume_cache = TTLCache(
+    "nyt_volumes", max_bytes=8 * 1024 * 1024, ttl_seconds=30 * 24 * 3600
+)
 
 router = APIRouter(tags=["pages"])
-templates = Jinja2Templates(directory="templates")
 
 
 async def fetch_google_books(query: str, max_results=20):
     """Fetch from Google Books API."""
-    async with httpx.AsyncClient() as client:
-        url = f"https://www.googleapis.com/books/v1/volumes?q={urllib.parse.quote(query)}&maxResults={max_results}&key={API_KEY}"
-        resp = await client.get(url, timeout=10)
-        return resp.json().get("items", [])
+    url = f"https://www.googleapis.com/books/v1/volumes?q={urllib.parse.quote(query)}&maxResults={max_results}&key={API_KEY}"
+    resp = await get_http_client().get(url, timeout=10)
+    return slim_volumes(resp.json().get("items", []))
+
+
+def nyt_key(title: str, author: str) -> str:
+    return f"{title.strip().lower()}|{author.strip().lower()}"
+
+
+async def load_nyt_volumes(keys):
+    """Resolve title+author keys to volumes from memory, then Supabase."""
+    found = {k: nyt_volume_cache.get(k) for k in keys if k in nyt_volume_cache}
+    missing = [k for k in keys if k not in found]
+    if missing:
+        try:
+            res = await db.execute(
+                supabase.table("nyt_volume_map")
+                .select("key, volume")
+                .in_("key", missing)
+            )
+            for row in res.data or []:
+                volume = slim_volume(row["volume"])
+                nyt_volume_cache.set(row["key"], volume)
+                found[row["key"]] = volume
+        except Exception as e:
+            print("⚠️ NYT volume map lookup failed:", e)
+    return found
+
+
+async def save_nyt_volumes(mapping: dict):
+    now = datetime.now(timezone.utc).isoformat()
+    await db.execute(
+        supabase.table("nyt_volume_map").upsert(
+            [{"key": k, "volume": v, "updated_at": now} for k, v in mapping.items()]
+        )
+    )
 
 
 async def fetch_nytimes_books(endpoint: str):
     """Fetch current NYTimes bestseller list."""
     try:
-        async with httpx.AsyncClient() as client:
-            url = f"https://api.nytimes.com/svc/books/v3/{endpoint}?api-key={NYT_KEY}"
-            r = await client.get(url, timeout=10)
-            data = r.json()
-            results = data.get("results", {}).get("books", [])
-            books = []
-            for b in results:
-                title = b.get("title", "")
-                author = b.get("author", "")
-                enriched = await fetch_google_books(
-                    f"intitle:{title} inauthor:{author}", 1
+        url = f"https://api.nytimes.com/svc/books/v3/{endpoint}?api-key={NYT_KEY}"
+        r = await get_http_client().get(url, timeout=10)
+        data = r.json()
+        results = data.get("results", {}).get("books", [])
+
+        keys = [nyt_key(b.get("title", ""), b.get("author", "")) for b in results]
+        known = await load_nyt_volumes(keys)
+
+        # Already-mapped titles cost nothing; only unknown ones hit Google
+        hits = {i: known[k] for i, k in enumerate(keys) if k in known}
+        todo = [i for i, k in enumerate(keys) if k not in known]
+        settled = set(hits)  # ranks whose outcome (hit or miss) is known
+        resolved = {}
+
+        def top_ranks_settled():
+            # Done once ranks 0..k are all settled and hold NYT_MAX_BOOKS hits:
+            # any lookup still pending then ranks below the last one shown
+            found = 0
+            for i in range(len(keys)):
+                if i not in settled:
+                    return False
+                found += i in hits
+                if found >= NYT_MAX_BOOKS:
+                    return True
+            return True
+
+        def lookup(b):
+            title = b.get("title", "")
+            author = b.get("author", "")
+            return lambda: fetch_google_books(f"intitle:{title} inauthor:{author}", 1)
+
+        if not top_ranks_settled():
+            async with aclosing(
+                bounded_stream(
+                    [lookup(results[i]) for i in todo],
+                    NYT_ENRICH_CONCURRENCY,
+                    NYT_ENRICH_TIMEOUT,
                 )
-                if enriched:
-                    books.append(enriched[0])
-            return books[:12]
+            ) as stream:
+                async for pos, enriched in stream:
+                    i = todo[pos]
+                    settled.add(i)
+                    if isinstance(enriched, Exception):
+                        print("⚠️ NYT enrichment failed:", enriched)
+                    elif enriched:
+                        hits[i] = enriched[0]
+                        resolved[keys[i]] = enriched[0]
+                    if top_ranks_settled():
+                        break  # cancels the lookups still pending
+
+        if resolved:
+            for k, v in resolved.items():
+                nyt_volume_cache.set(k, v)
+            spawn(save_nyt_volumes(resolved))
+
+        # Keep the bestseller ranking order
+        return [hits[i] for i in sorted(hits)][:NYT_MAX_BOOKS]
     except Exception as e:
         print("NYTimes fetch failed:", e)
         return []
@@ -114,30 +245,33 @@ async def build_top():
         "Nonfiction",
         "Science",
     ]
-    results = []
 
-    async with httpx.AsyncClient() as client:
-        for g in genres:
-            try:
-                # Include both "top rated" and the year to increase relevancy
-                query = f"subject:{g} (2024 OR 2025) best books OR top rated OR award winning"
-                url = (
-                    f"https://www.googleapis.com/books/v1/volumes?"
-                    f"q={urllib.parse.quote(query)}&orderBy=relevance&maxResults=40&key={API_KEY}"
-                )
-                r = await client.get(url, timeout=10)
-                for b in r.json().get("items", []):
-                    info = b.get("volumeInfo", {})
-                    pub = info.get("publishedDate", "")
-                    try:
-                        pub_year = int(pub.split("-")[0])
-                    except:
-                        pub_year = 0
-                    # ✅ Allow good ratings and newer publications
-                    if pub_year >= 2024:
-                        results.append(b)
-            except Exception as e:
-                print("Error fetching top rated:", e)
+    def top_query(g):
+        # Include both "top rated" and the year to increase relevancy
+        query = f"subject:{g} (2024 OR 2025) best books OR top rated OR award winning"
+        url = (
+            f"https://www.googleapis.com/books/v1/volumes?"
+            f"q={urllib.parse.quote(query)}&orderBy=relevance&maxResults=40&key={API_KEY}"
+        )
+
+        async def fetch():
+            r = await get_http_client().get(url, timeout=10)
+            return slim_volumes(r.json().get("items", []))
+
+        return fetch
+
+    # All genres in parallel; every genre is ranked, whichever answers first
+    by_genre = {}
+    async with aclosing(
+        bounded_stream([top_query(g) for g in genres], CAROUSEL_FANOUT_CONCURRENCY)
+    ) as stream:
+        async for i, items in stream:
+            if isinstance(items, Exception):
+                print("Error fetching top rated:", items)
+                continue
+            # ✅ Allow good ratings and newer publications
+            by_genre[i] = filter_recent_books(items, 2024)
+    results = [b for i in sorted(by_genre) for b in by_genre[i]]
 
     # ✅ Filter books published from 2024 onward
     results = filter_recent_books(results, 2024)
@@ -174,23 +308,34 @@ async def build_top():
 async def build_featured():
     """Editor's Picks — curated genre mix with fallback and year filter."""
     curated = ["Romance", "Science Fiction", "Mystery"]
-    picks = []
 
     try:
-        # Fetch 3–4 books from each curated genre
-        for g in curated:
-            items = await fetch_google_books(f"subject:{g} 2024 OR 2025", 8)
-            picks.extend(items[:4])
-
-        # ✅ Filter by publication year ≥ 2023
-        picks = filter_recent_books(picks, 2023)
+        # Fetch 3–4 books from each curated genre, all genres at once
+        by_genre = {}
+        async with aclosing(
+            bounded_stream(
+                [
+                    lambda g=g: fetch_google_books(f"subject:{g} 2024 OR 2025", 8)
+                    for g in curated
+                ],
+                CAROUSEL_FANOUT_CONCURRENCY,
+            )
+        ) as stream:
+            async for i, items in stream:
+                if isinstance(items, Exception):
+                    print(f"⚠️ Featured genre fetch failed: {items}")
+                    continue
+                # ✅ Filter by publication year ≥ 2023
+                by_genre[i] = filter_recent_books(items[:4], 2023)
+        # Curated order, not the order the genres happened to answer in
+        picks = [b for i in sorted(by_genre) for b in by_genre[i]]
 
         # --- Fallback if too few books found ---
         if len(picks) < 10:
             print(f"⚠️ Only {len(picks)} featured books found, using cached fallback.")
 
             # try to fetch cached data (old Supabase results)
-            old_cache = get_cache("featured")
+            old_cache = await get_cache("featured")
             old_books = old_cache["data"] if old_cache else []
 
             # combine old books with new, avoid duplicates
@@ -215,41 +360,106 @@ async def build_featured():
 # --------------------------
 
 
-def get_cache(filter_id: str):
+async def get_cache(filter_id: str):
+    row = carousel_rows.get(filter_id)
+    if row is not None:
+        return row
     res = (
-        supabase.table("carousel_cache").select("*").eq("id", filter_id).execute().data
-    )
+        await db.execute(
+            supabase.table("carousel_cache").select("*").eq("id", filter_id)
+        )
+    ).data
+    if res:
+        carousel_rows.set(filter_id, res[0])
     return res[0] if res else None
 
 
-def save_cache(filter_id: str, data):
-    supabase.table("carousel_cache").upsert(
-        {
-            "id": filter_id,
-            "data": data,
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-        }
-    ).execute()
+async def save_cache(filter_id: str, data):
+    row = {
+        "id": filter_id,
+        "data": data,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await db.execute(supabase.table("carousel_cache").upsert(row))
+    carousel_rows.set(filter_id, row)
+    return row
 
 
-async def ensure_cached(filter_id: str, force_refresh: bool = False):
+def cache_age(row) -> timedelta:
+    """How long ago a carousel_cache row was written (huge if unparseable)."""
     now = datetime.now(timezone.utc)
-    row = get_cache(filter_id)
+    try:
+        ts = row["updated_at"]
+        if isinstance(ts, str):
+            ts = ts.replace("Z", "+00:00") if "Z" in ts else ts
+        return now - datetime.fromisoformat(ts)
+    except Exception:
+        return timedelta(days=999)
+
+
+async def ensure_cached_row(filter_id: str, force_refresh: bool = False):
+    """The carousel_cache row for ``filter_id``, building it if missing.
+
+    None if there is still no row (another worker holds the rebuild lease
+    for a carousel that was never built).
+    """
+    row = await get_cache(filter_id)
     old_data = row["data"] if row else []
-    last_updated = None
 
     if row and not force_refresh:
-        try:
-            ts = row["updated_at"]
-            if isinstance(ts, str):
-                ts = ts.replace("Z", "+00:00") if "Z" in ts else ts
-            last_updated = datetime.fromisoformat(ts)
-        except Exception:
-            last_updated = now - timedelta(days=999)
+        if cache_age(row) < timedelta(days=CACHE_TTL_DAYS):
+            return row
+
+        # ♻️ Stale-while-revalidate: serve the old row, rebuild in background
+        if not carousel_flight.in_flight(filter_id):
+            print(f"♻️ {filter_id} carousel is stale, refreshing in background.")
+            spawn(carousel_flight.do(filter_id, _leased_rebuild, filter_id, old_data))
+        return row
+
+    # Nothing cached yet (or forced): build inline, once per filter_id
+    return await carousel_flight.do(filter_id, rebuild_carousel, filter_id, old_data)
 
-        if (now - last_updated) < timedelta(days=CACHE_TTL_DAYS):
-            return old_data
 
+async def ensure_cached(filter_id: str, force_refresh: bool = False):
+    row = await ensure_cached_row(filter_id, force_refresh)
+    return row["data"] if row else []
+
+
+async def carousel_refresher():
+    """Pre-warm carousels shortly before they expire so no request rebuilds them."""
+    while True:
+        for filter_id in CAROUSEL_FILTERS:
+            try:
+                row = await get_cache(filter_id)
+                refresh_at = timedelta(days=CACHE_TTL_DAYS) - CAROUSEL_REFRESH_AHEAD
+                if not row or cache_age(row) >= refresh_at:
+                    print(f"🔄 Pre-warming {filter_id} carousel.")
+                    await carousel_flight.do(
+                        filter_id,
+                        _leased_rebuild,
+                        filter_id,
+                        row["data"] if row else [],
+                    )
+            except Exception as e:
+                print(f"⚠️ Carousel refresher failed for {filter_id}: {e}")
+        await asyncio.sleep(CAROUSEL_REFRESH_INTERVAL)
+
+
+async def _leased_rebuild(filter_id: str, old_data):
+    """Background rebuild, run by only one worker across all instances.
+
+    carousel_flight only coalesces within a process; the lease keeps every
+    worker's refresher from rebuilding the same carousel at the same time.
+    Inline builds can join this flight, so losing the lease still returns
+    a row: whatever is cached now (None only if nothing ever was).
+    """
+    if not await claim_lease(f"carousel:{filter_id}", CAROUSEL_LEASE_SECONDS):
+        print(f"⏭️ {filter_id} carousel is being rebuilt by another worker.")
+        return await get_cache(filter_id)
+    return await rebuild_carousel(filter_id, old_data)
+
+
+async def rebuild_carousel(filter_id: str, old_data):
     # --- Rebuild fresh data ---
     if filter_id == "month":
         new_data = await build_month()
@@ -276,85 +486,155 @@ async def ensure_cached(filter_id: str, force_refresh: bool = False):
             if len(new_data) >= 12:
                 break
 
-    # --- Save merged result ---
-    save_cache(filter_id, new_data)
-    return new_data
+    # --- Save merged result (compact records only) ---
+    new_data = slim_volumes(new_data)
+    return await save_cache(filter_id, new_data)
 
 
 # --------------------------
-# Main page route
+# Homepage section loaders
 # --------------------------
 
 
-@router.get("/", response_class=HTMLResponse)
-async def homepage(request: Request):
-    user = request.session.get("user")
-    if not user:
-        return RedirectResponse(url="/login", status_code=302)
-
-    user_email = user["email"]
-    filter_option = request.query_params.get("filter", "")
-
-    all_favorites = (
+async def _load_favorites(user_email: str):
+    res = await db.execute(
         supabase.table("favorites")
         .select("*")
         .eq("user_email", user_email)
         .order("created_at", desc=True)
-        .execute()
-        .data
-        or []
-    )
-    favorites = all_favorites[:5]
-    shelves = (
-        supabase.table("shelves")
-        .select("*")
-        .eq("user_email", user_email)
         .limit(5)
-        .execute()
-        .data
-        or []
     )
+    return res.data or []
 
-    history_res = (
-        supabase.table("search_history")
-        .select("query")
-        .eq("user_email", user_email)
-        .order("created_at", desc=True)
-        .limit(10)
-        .execute()
-    )
-    search_history_raw = (
-        [h["query"] for h in history_res.data] if history_res.data else []
+
+async def _load_shelves(user_email: str):
+    res = await db.execute(
+        supabase.table("shelves").select("*").eq("user_email", user_email).limit(5)
     )
+    return res.data or []
 
-    search_history_display = []
-    for item in search_history_raw:
-        if item.startswith("inauthor:"):
-            label = "Author: " + item.replace("inauthor:", "")
-        elif item.startswith("intitle:"):
-            label = "Title: " + item.replace("intitle:", "")
-        elif item.startswith("subject:"):
-            label = "Category: " + item.replace("subject:", "")
-        else:
-            label = item
-        search_history_display.append(label)
-    search_history_zipped = list(zip(search_history_raw, search_history_display))
-
-    viewed_books = (
+
+async def _load_viewed(user_email: str):
+    res = await db.execute(
         supabase.table("recently_viewed")
         .select("book_id, title, thumbnail")
         .eq("user_email", user_email)
         .order("created_at", desc=True)
         .limit(5)
-        .execute()
-        .data
-        or []
     )
+    return res.data or []
+
+
+async def _fetch_genre_books(genre: str):
+    """Top volumes for one genre, stored in the shared pool. None on failure."""
+    feature_query = f"subject:{genre}"
+    url_feat = (
+        f"https://www.googleapis.com/books/v1/volumes?"
+        f"q={urllib.parse.quote(feature_query)}&maxResults={FEATURED_PER_GENRE}"
+        f"&orderBy=relevance&key={API_KEY}"
+    )
+    try:
+        resp = await get_http_client().get(url_feat, timeout=10.0)
+        if resp.status_code != 200:
+            print(f"❌ Featured fetch for {genre} failed: {resp.status_code}")
+            return None
+        books = slim_volumes(resp.json().get("items", []))
+    except Exception as e:
+        print(f"❌ Error fetching {genre}: {e}")
+        return None
+    await featured_pool.set(genre.lower(), books)
+    print(f"🧠 Cached {len(books)} featured books for genre {genre}.")
+    return books
+
+
+async def _genre_books(genre: str) -> list:
+    key = genre.lower()
+    books = await featured_pool.get(key)
+    if books is None:
+        # Users sharing a genre coalesce onto one upstream request
+        books = await featured_flight.do(key, _fetch_genre_books, genre)
+    return books or []
+
+
+async def _featured_for_user(top_genres) -> list:
+    """Personalized featured books, assembled from the per-genre pool."""
+    results = await asyncio.gather(*(_genre_books(g) for g in top_genres))
+    featured_books, seen = [], set()
+    for book in (b for books in results for b in books):
+        if book["id"] not in seen:
+            seen.add(book["id"])
+            featured_books.append(book)
+    return featured_books
+
+
+async def _snapshot_section(snapshot):
+    return snapshot
+
+
+async def _load_snapshot(user_email: str, timings: dict):
+    """Per-user homepage sections, cached until the user changes one of them."""
+    favorites, shelves, viewed, genres = await asyncio.gather(
+        timed("favorites", _load_favorites(user_email), timings, SECTION_TIMEOUT),
+        timed("shelves", _load_shelves(user_email), timings, SECTION_TIMEOUT),
+        timed("viewed", _load_viewed(user_email), timings, SECTION_TIMEOUT),
+        timed("genres", load_genres(user_email), timings, SECTION_TIMEOUT),
+    )
+    snapshot = {
+        "favorites": favorites or [],
+        "shelves": shelves or [],
+        "viewed": viewed or [],
+        "genres": genres or rank_genres([]),
+    }
+    # Don't pin a section that failed or timed out for the whole TTL
+    if None not in (favorites, shelves, viewed, genres):
+        save_snapshot(user_email, snapshot)
+    return snapshot
+
+
+# --------------------------
+# Main page route
+# --------------------------
+
+
+@router.get("/", response_class=HTMLResponse)
+async def homepage(request: Request):
+    user = request.session.get("user")
+    if not user:
+        return RedirectResponse(url="/login", status_code=302)
+
+    user_email = user["email"]
+    filter_option = request.query_params.get("filter", "")
+
+    # ✅ Default to "new arrivals" if no filter specified
+    filter_option = filter_option or "month"
+
+    # --- Fan out independent lookups; page latency ≈ slowest section ---
+    timings = {}
+    snapshot = get_snapshot(user_email)
+    (
+        snapshot,
+        search_history_raw,
+        carousel_row,
+    ) = await asyncio.gather(
+        (
+            _snapshot_section(snapshot)
+            if snapshot
+            else _load_snapshot(user_email, timings)
+        ),
+        timed("history", get_history(user_email), timings, SECTION_TIMEOUT, []),
+        timed("carousel", ensure_cached_row(filter_option), timings, CAROUSEL_TIMEOUT),
+    )
+    carousel_books = carousel_row["data"] if carousel_row else []
+    # index.html caches the rendered carousel per filter + row version
+    carousel_version = carousel_row.get("updated_at") if carousel_row else None
+
+    search_history_zipped = history_labels(search_history_raw)
 
     seen_ids = set()
     # Normalize keys so the template expects "id" instead of "book_id"
     filtered_books = []
-    for book in viewed_books:
+    # Views still waiting in the write-behind buffer are the most recent ones
+    for book in activity_buffer.pending_views(user_email) + snapshot["viewed"]:
         if book["book_id"] not in seen_ids:
             seen_ids.add(book["book_id"])
             filtered_books.append(
@@ -364,177 +644,28 @@ async def homepage(request: Request):
                     "thumbnail": book.get("thumbnail", ""),
                 }
             )
+    filtered_books = filtered_books[:5]
+    favorites = snapshot["favorites"]
+    shelves = snapshot["shelves"]
+    genres = snapshot["genres"]
 
-    # --- Build base genres ---
-    default_genres = [
-        {"name": "Romance", "link": "Romance", "count": 0},
-        {"name": "Mystery", "link": "Mystery", "count": 0},
-        {"name": "Fantasy", "link": "Fantasy", "count": 0},
-        {"name": "Action", "link": "Action", "count": 0},
-        {"name": "Science Fiction", "link": "Science Fiction", "count": 0},
-        {"name": "Horror", "link": "Horror", "count": 0},
-        {"name": "Adventure", "link": "Adventure", "count": 0},
-        {"name": "Western", "link": "Western", "count": 0},
+    # --- Personalized Featured Books (shared per-genre pool) ---
+    top_genres = [g["name"] for g in genres[:3] if g["name"]] or [
+        "Fiction",
+        "Romance",
+        "Mystery",
     ]
-
-    # start fresh, don't reuse default references
-    genres = []
-    genre_map = {}
-
-    # add defaults first
-    for g in default_genres:
-        genres.append(g)
-        genre_map[g["name"].lower()] = g
-
-    # --- Add user genres dynamically ---
-    for fav in all_favorites:
-        if fav.get("categories"):
-            for raw_cat in fav["categories"].split(","):
-                c = raw_cat.strip()
-                if "/" in c:
-                    c = c.split("/", 1)[0].strip()
-                else:
-                    c = c.strip()
-
-                # skip empty or too short
-                if len(c) < 4:
-                    continue
-
-                # normalize capitalization
-                c = c.title()
-
-                key = c.lower()
-                if key in genre_map:
-                    genre_map[key]["count"] += 1
-                else:
-                    genres.append({"name": c, "link": c, "count": 1})
-                    genre_map[key] = genres[-1]
-
-    # --- Sort user-added genres above defaults ---
-    genres = sorted(
-        genres,
-        key=lambda x: (
-            x["count"],
-            x["name"] not in [d["name"] for d in default_genres],
-        ),
-        reverse=True,
+    featured_books = await timed(
+        "featured",
+        _featured_for_user(top_genres),
+        timings,
+        SECTION_TIMEOUT,
+        [],
     )
-    genres = genres[:15]
-
-    #  carousel_books
-    search_terms = {
-        "week": "trending books this week",
-        "month": "bestsellers this month",
-        "top": "top rated books in 2025",
-        "new": "new book releases",
-    }
-
-    # ✅ Default to "new arrivals" if no filter specified
-    filter_option = filter_option or "month"
-
-    selected_query = search_terms.get(filter_option, "new book releases")
-
-    carousel_books, featured_books = [], []
-    async with httpx.AsyncClient() as client:
-        try:
-            carousel_books = await ensure_cached(filter_option)
-        except Exception as e:
-            print("Error fetching carousel books:", e)
-
-        # --- Personalized Featured Books (Supabase + memory cache) ---
-        featured_books = []
-        try:
-            top_genres = [g["name"] for g in genres[:3] if g["name"]] or [
-                "Fiction",
-                "Romance",
-                "Mystery",
-            ]
-            user_email = user["email"]
-
-            cache_entry = featured_cache.get(user_email)
-            cache_valid = (
-                cache_entry
-                and cache_entry["genres"] == top_genres
-                and time() - cache_entry["timestamp"] < 6 * 60 * 60  # 6 hours
-            )
-
-            if cache_valid:
-                featured_books = cache_entry["data"]
-                print(f"✅ Using in-memory featured cache for {user_email}.")
-            else:
-                # 🔍 Check Supabase persistent cache
-                db_cache = (
-                    supabase.table("featured_cache")
-                    .select("*")
-                    .eq("user_email", user_email)
-                    .execute()
-                    .data
-                )
-
-                db_valid = False
-                if db_cache:
-                    db_entry = db_cache[0]
-                    # Check if genres match and data is recent (6 hrs)
-
-                    updated_at = datetime.fromisoformat(
-                        db_entry["updated_at"].replace("Z", "+00:00")
-                    )
-                    age_seconds = (
-                        datetime.now(timezone.utc) - updated_at
-                    ).total_seconds()
-                    if db_entry["genres"] == top_genres and age_seconds < 6 * 60 * 60:
-                        featured_books = db_entry["data"]
-                        db_valid = True
-                        print(f"✅ Using Supabase cached featured for {user_email}.")
-
-                if not db_valid:
-                    print(
-                        f"📚 Rebuilding featured for {user_email} (new genres: {top_genres})"
-                    )
 
-                    async def fetch_books_for_genre(client, genre):
-                        try:
-                            feature_query = f"subject:{genre}"
-                            url_feat = (
-                                f"https://www.googleapis.com/books/v1/volumes?"
-                                f"q={urllib.parse.quote(feature_query)}&maxResults=4&orderBy=relevance&key={API_KEY}"
-                            )
-                            resp = await client.get(url_feat, timeout=10.0)
-                            if resp.status_code == 200:
-                                return resp.json().get("items", [])
-                        except Exception as e:
-                            print(f"❌ Error fetching {genre}: {e}")
-                        return []
-
-                    async with httpx.AsyncClient() as client:
-                        tasks = [fetch_books_for_genre(client, g) for g in top_genres]
-                        results = await asyncio.gather(*tasks)
-                    featured_books = [b for r in results for b in r if r]
-
-                    # ✅ Save both in memory and Supabase
-                    featured_cache[user_email] = {
-                        "data": featured_books,
-                        "genres": top_genres,
-                        "timestamp": time(),
-                    }
-
-                    # Upsert (insert or update)
-                    supabase.table("featured_cache").upsert(
-                        {
-                            "user_email": user_email,
-                            "genres": top_genres,
-                            "data": featured_books,
-                            "updated_at": datetime.utcnow().isoformat() + "Z",
-                        }
-                    ).execute()
-
-                    print(
-                        f"🧠 Cached featured books ({len(featured_books)}) for {user_email} in Supabase."
-                    )
-        except Exception as e:
-            print("❌ Error fetching personalized featured books:", e)
+    cloud_logger.info(f"⏱️ homepage sections for {user_email}: {timings}")
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "index.html",
         {
             "request": request,
@@ -545,10 +676,13 @@ async def homepage(request: Request):
             "viewed_books": filtered_books,
             "genres": genres,
             "carousel_books": carousel_books,
+            "carousel_version": carousel_version,
             "featured_books": featured_books,
             "filter": filter_option,
         },
     )
+    response.headers["Server-Timing"] = server_timing(timings)
+    return response
 
 
 # --- Clear Recently Viewed ---
@@ -558,7 +692,11 @@ async def clear_recently_viewed(request: Request):
     if not user:
         return RedirectResponse(url="/login")
     user_email = user["email"]
-    supabase.table("recently_viewed").delete().eq("user_email", user_email).execute()
+    activity_buffer.discard_user(user_email, searches=False)
+    await db.execute(
+        supabase.table("recently_viewed").delete().eq("user_email", user_email)
+    )
+    invalidate_homepage(user_email)
     return RedirectResponse(url="/", status_code=303)
 
 
@@ -569,15 +707,35 @@ async def clear_search_history(request: Request):
     if not user:
         return RedirectResponse(url="/login")
     user_email = user["email"]
-    supabase.table("search_history").delete().eq("user_email", user_email).execute()
+    activity_buffer.discard_user(user_email, views=False)
+    await db.execute(
+        supabase.table("search_history").delete().eq("user_email", user_email)
+    )
+    forget_history(user_email)
     return RedirectResponse(url="/", status_code=303)
 
 
 # --- API endpoint for AJAX updates (no full reload) ---
 @router.get("/api/books")
-async def api_books(filter: str = ""):
-    data = await ensure_cached(filter or "month")
-    return {"carousel_books": data}
+async def api_books(request: Request, filter: str = ""):
+    filter_id = filter or "month"
+    row = await ensure_cached_row(filter_id)
+    if not row:
+        # First build still running on another worker; don't let it be cached
+        return JSONResponse(
+            {"carousel_books": []}, headers={"Cache-Control": "no-store"}
+        )
+
+    # The row only changes when a rebuild rewrites updated_at
+    etag = strong_etag(filter_id, row["updated_at"])
+    cached = not_modified(request, etag, API_BOOKS_CACHE_CONTROL)
+    if cached:
+        return cached
+
+    return JSONResponse(
+        {"carousel_books": slim_volumes(row["data"])},
+        headers={"ETag": etag, "Cache-Control": API_BOOKS_CACHE_CONTROL},
+    )
 
 
 # --------------------------
@@ -599,3 +757,13 @@ async def refresh_cache(token: str):
             "featured": len(featured or []),
         },
     }
+
+
+# --------------------------
+# Admin cache stats endpoint
+# --------------------------
+@router.get("/admin/cache-stats")
+async def cache_stats_view(token: str):
+    if token != ADMIN_TOKEN:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    return cache_stats()
@@ -2,29 +2,33 @@
 
 from fastapi import APIRouter, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from supabase_client import supabase
+from core import db
 from core.security import get_current_user_email
+from core.templates import templates
+from core.snapshots import invalidate_homepage
 import logging
 from fastapi import Body
 
 cloud_logger = logging.getLogger("bookshelf")
 
 router = APIRouter(tags=["shelves"])
-templates = Jinja2Templates(directory="templates")
 
 
 @router.post("/remove-from-shelf")
 async def remove_from_shelf(
     request: Request, shelf_id: int = Form(...), book_id: str = Form(...)
 ):
-    user_email = get_current_user_email(request)
+    user_email = await get_current_user_email(request)
     if not user_email:
         return RedirectResponse(url="/login")
 
-    supabase.table("shelf_books").delete().eq("shelf_id", shelf_id).eq(
-        "book_id", book_id
-    ).execute()
+    await db.execute(
+        supabase.table("shelf_books")
+        .delete()
+        .eq("shelf_id", shelf_id)
+        .eq("book_id", book_id)
+    )
 
     return RedirectResponse(url=f"/shelf/{shelf_id}", status_code=303)
 
@@ -35,8 +39,8 @@ async def shelves_page(request: Request):
     if not user:
         return RedirectResponse(url="/login", status_code=302)
     user_email = user["email"]
-    shelves = (
-        supabase.table("shelves").select("*").eq("user_email", user_email).execute()
+    shelves = await db.execute(
+        supabase.table("shelves").select("*").eq("user_email", user_email)
     )
     return templates.TemplateResponse(
         "shelves.html",
@@ -55,8 +59,8 @@ async def create_shelf(request: Request, name: str = Form(...)):
     # ✅ Length validation
     if len(name.strip()) > 20:
         # Fetch shelves again so template has data
-        shelves = (
-            supabase.table("shelves").select("*").eq("user_email", user_email).execute()
+        shelves = await db.execute(
+            supabase.table("shelves").select("*").eq("user_email", user_email)
         )
         return templates.TemplateResponse(
             "shelves.html",
@@ -69,18 +73,18 @@ async def create_shelf(request: Request, name: str = Form(...)):
         )
 
     # ✅ Check for duplicates
-    existing = (
+    existing = await db.execute(
         supabase.table("shelves")
         .select("*")
         .eq("user_email", user_email)
         .eq("name", name)
-        .execute()
     )
 
     if not existing.data:
-        supabase.table("shelves").insert(
-            {"user_email": user_email, "name": name}
-        ).execute()
+        await db.execute(
+            supabase.table("shelves").insert({"user_email": user_email, "name": name})
+        )
+        invalidate_homepage(user_email)
 
     # ✅ Redirect user appropriately
     referer = request.headers.get("referer")
@@ -92,17 +96,21 @@ async def create_shelf(request: Request, name: str = Form(...)):
 
 @router.post("/delete-shelf")
 async def delete_shelf(request: Request, shelf_id: int = Form(...)):
-    user_email = get_current_user_email(request)
+    user_email = await get_current_user_email(request)
     if not user_email:
         return RedirectResponse(url="/login")
 
     cloud_logger.info(f"🗑️ {user_email} deleted shelf ID: {shelf_id}")
     # Delete all shelf books first
-    supabase.table("shelf_books").delete().eq("shelf_id", shelf_id).execute()
+    await db.execute(supabase.table("shelf_books").delete().eq("shelf_id", shelf_id))
     # Delete shelf
-    supabase.table("shelves").delete().eq("id", shelf_id).eq(
-        "user_email", user_email
-    ).execute()
+    await db.execute(
+        supabase.table("shelves")
+        .delete()
+        .eq("id", shelf_id)
+        .eq("user_email", user_email)
+    )
+    invalidate_homepage(user_email)
 
     return RedirectResponse(url="/shelves", status_code=303)
 
@@ -113,17 +121,18 @@ async def view_shelf(shelf_id: int, request: Request):
     if not user:
         return RedirectResponse(url="/login")
     user_email = user["email"]
-    shelf = (
+    shelf = await db.execute(
         supabase.table("shelves")
         .select("*")
         .eq("id", shelf_id)
         .eq("user_email", user_email)
-        .execute()
     )
     if not shelf.data:
         raise HTTPException(status_code=404, detail="Shelf not found")
 
-    books = supabase.table("shelf_books").select("*").eq("shelf_id", shelf_id).execute()
+    books = await db.execute(
+        supabase.table("shelf_books").select("*").eq("shelf_id", shelf_id)
+    )
 
     return templates.TemplateResponse(
         "shelf_detail.html",
@@ -138,7 +147,7 @@ async def view_shelf(shelf_id: int, request: Request):
 
 @router.post("/shelf-json")
 async def toggle_shelf_json(request: Request, data: dict = Body(...)):
-    user_email = get_current_user_email(request)
+    user_email = await get_current_user_email(request)
     if not user_email:
         return {"success": False, "message": "Unauthorized"}
 
@@ -150,28 +159,32 @@ async def toggle_shelf_json(request: Request, data: dict = Body(...)):
     in_shelf = data.get("in_shelf")
 
     if in_shelf:
-        supabase.table("shelf_books").delete().eq("shelf_id", shelf_id).eq(
-            "book_id", book_id
-        ).execute()
+        await db.execute(
+            supabase.table("shelf_books")
+            .delete()
+            .eq("shelf_id", shelf_id)
+            .eq("book_id", book_id)
+        )
         cloud_logger.info(f"📕 removed {book_id} from shelf {shelf_id}")
         return {"success": True, "action": "removed"}
     else:
-        existing = (
+        existing = await db.execute(
             supabase.table("shelf_books")
             .select("*")
             .eq("shelf_id", shelf_id)
             .eq("book_id", book_id)
-            .execute()
         )
         if not existing.data:
-            supabase.table("shelf_books").insert(
-                {
-                    "shelf_id": shelf_id,
-                    "book_id": book_id,
-                    "title": title,
-                    "authors": authors,
-                    "thumbnail": thumbnail,
-                }
-            ).execute()
+            await db.execute(
+                supabase.table("shelf_books").insert(
+                    {
+                        "shelf_id": shelf_id,
+                        "book_id": book_id,
+                        "title": title,
+                        "authors": authors,
+                        "thumbnail": thumbnail,
+                    }
+                )
+            )
         cloud_logger.info(f"📘 added {book_id} to shelf {shelf_id}")
         return {"success": True, "action": "added"}
@@ -0,0 +1,56 @@
+# routers/thumbs.py
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, RedirectResponse, Response
+from core.etag import strong_etag, not_modified
+from core.singleflight import SingleFlight
+from core.thumbs import (
+    THUMB_SIZES,
+    DEFAULT_SIZE,
+    is_allowed,
+    pick_format,
+    get_thumbnail,
+)
+import logging
+
+cloud_logger = logging.getLogger("bookshelf")
+
+router = APIRouter(tags=["thumbs"])
+
+# A cover URL always points at the same image, so let browsers keep it
+THUMB_CACHE_CONTROL = "public, max-age=2592000, immutable"
+
+thumb_flight = SingleFlight("thumb")
+
+
+@router.get("/thumb")
+async def thumbnail(request: Request, url: str, size: str = DEFAULT_SIZE):
+    if not is_allowed(url):
+        return JSONResponse({"error": "Host not allowed"}, status_code=400)
+    if size not in THUMB_SIZES:
+        size = DEFAULT_SIZE
+
+    fmt = pick_format(request.headers.get("accept", ""))
+    etag = strong_etag(url, size, fmt)
+    cached = not_modified(request, etag, THUMB_CACHE_CONTROL)
+    if cached:
+        cached.headers["Vary"] = "Accept"
+        return cached
+
+    try:
+        data, media_type = await thumb_flight.do(
+            f"{url}|{size}|{fmt}", get_thumbnail, url, size, fmt
+        )
+    except Exception as e:
+        # Let the browser try the origin itself rather than show a broken image
+        cloud_logger.warning(f"⚠️ Thumbnail proxy failed for {url}: {e}")
+        return RedirectResponse(url, status_code=302)
+
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={
+            "ETag": etag,
+            "Cache-Control": THUMB_CACHE_CONTROL,
+            "Vary": "Accept",
+        },
+    )
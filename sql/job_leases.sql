@@ -0,0 +1,29 @@
+-- Short-lived leases so one worker (of however many instances) runs a
+-- periodic job at a time, e.g. the carousel rebuilds in routers/pages.py.
+-- PostgREST calls are separate transactions, so a session advisory lock
+-- can't be held across a rebuild; a row with an expiry can.
+create table if not exists job_leases (
+    name text primary key,
+    owner text not null,
+    expires_at timestamptz not null
+);
+
+-- True if p_owner now holds the lease: it was free, expired, or already
+-- p_owner's. The conditional upsert is atomic under the row lock.
+create or replace function claim_lease(
+    p_name text,
+    p_owner text,
+    p_seconds integer
+) returns boolean
+language sql
+as $$
+    with claimed as (
+        insert into job_leases as l (name, owner, expires_at)
+        values (p_name, p_owner, now() + make_interval(secs => p_seconds))
+        on conflict (name) do update
+            set owner = excluded.owner, expires_at = excluded.expires_at
+            where l.expires_at <= now() or l.owner = excluded.owner
+        returning 1
+    )
+    select exists (select 1 from claimed);
+$$;
@@ -0,0 +1,7 @@
+-- NYT bestseller title+author → Google Books volume, so weekly lists
+-- don't re-resolve the same books (see fetch_nytimes_books).
+create table if not exists nyt_volume_map (
+    key text primary key,            -- "title|author", lowercased
+    volume jsonb not null,
+    updated_at timestamptz not null default now()
+);
@@ -0,0 +1,7 @@
+-- Shared Google Books search results, keyed by the normalized query
+-- (see core/search_cache.py). Only used when SEARCH_CACHE_TABLE=true.
+create table if not exists search_cache (
+    query text primary key,
+    items jsonb not null,
+    updated_at timestamptz not null default now()
+);
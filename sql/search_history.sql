@@ -0,0 +1,14 @@
+-- One row per (user, query): repeat searches only bump created_at, and the
+-- write-behind flush in core/activity.py can bulk upsert on this key.
+-- Drop older duplicates first so the unique index can be created.
+delete from search_history a
+using search_history b
+where a.user_email = b.user_email
+  and a.query = b.query
+  and (a.created_at, a.id) < (b.created_at, b.id);
+
+create unique index if not exists search_history_user_query_key
+    on search_history (user_email, query);
+
+create index if not exists search_history_user_created_idx
+    on search_history (user_email, created_at desc);
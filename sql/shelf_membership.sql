@@ -0,0 +1,12 @@
+-- Indexes for "which of this user's shelves hold these books?" lookups (the
+-- detail page and core/membership.py). The queries inner-join shelves on the
+-- user's email, so Postgres can start from the user's few shelves and probe
+-- shelf_books per shelf: cost follows one user's shelves, not how many
+-- people shelved a popular book.
+create index if not exists shelves_user_email_id_idx
+    on shelves (user_email, id);
+
+-- Also serves the shelf page (shelf_id only) and the add/remove checks
+-- (shelf_id + book_id) in routers/shelves.py.
+create index if not exists shelf_books_shelf_book_idx
+    on shelf_books (shelf_id, book_id);
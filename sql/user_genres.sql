@@ -0,0 +1,49 @@
+-- Per-user genre histogram over favorites, maintained incrementally by the
+-- favorite endpoints (see core/genres.py) so the homepage reads only the
+-- top counts instead of re-parsing every favorite.
+create table if not exists user_genres (
+    user_email text not null,
+    genre text not null,
+    count integer not null default 0,
+    updated_at timestamptz not null default now(),
+    primary key (user_email, genre)
+);
+
+create index if not exists user_genres_user_count_idx
+    on user_genres (user_email, count desc);
+
+-- Add p_delta for each occurrence of a genre (a favorite can list one twice),
+-- dropping rows that reach zero.
+create or replace function bump_user_genres(
+    p_user_email text,
+    p_genres text[],
+    p_delta integer
+) returns void
+language sql
+as $$
+    insert into user_genres as ug (user_email, genre, count, updated_at)
+    select p_user_email, g, p_delta * count(*), now()
+    from unnest(p_genres) as g
+    group by g
+    on conflict (user_email, genre)
+    do update set count = ug.count + excluded.count, updated_at = now();
+
+    delete from user_genres
+    where user_email = p_user_email
+      and genre = any(p_genres)
+      and count <= 0;
+$$;
+
+-- Backfill from existing favorites, using the same normalization as
+-- core.genres.parse_genres: first segment before "/", at least 4 chars,
+-- title-cased.
+insert into user_genres (user_email, genre, count)
+select user_email, initcap(g), count(*)
+from (
+    select f.user_email, trim(split_part(trim(c), '/', 1)) as g
+    from favorites f, unnest(string_to_array(f.categories, ',')) as c
+    where coalesce(f.categories, '') <> ''
+) parsed
+where length(g) >= 4
+group by user_email, initcap(g)
+on conflict (user_email, genre) do nothing;
@@ -1,5 +1,6 @@
 import os
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from supabase_auth import SyncMemoryStorage
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,3 +10,19 @@ SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 
 # This should work without errors
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+
+
+def create_auth_client(storage: SyncMemoryStorage | None = None) -> Client:
+    """A throwaway client for one stateful auth flow (sign-in, code exchange,
+    password reset). Those calls store a session on the client, so running
+    them on the shared ``supabase`` client would let concurrent requests act
+    on each other's session."""
+    return create_client(
+        SUPABASE_URL,
+        SUPABASE_ANON_KEY,
+        options=ClientOptions(
+            auto_refresh_token=False,
+            persist_session=False,
+            storage=storage or SyncMemoryStorage(),
+        ),
+    )